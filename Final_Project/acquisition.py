@@ -0,0 +1,317 @@
+import time
+from abc import ABC, abstractmethod
+import numpy as np
+
+VREF = 3.3  # reference voltage the MCP3008 is powered from
+# AnalogIn scales the 10-bit code to 16 bits before converting, keep the
+# same scale so the voltage thresholds in the scopes stay valid
+VOLTS_PER_COUNT = 64 / 65535
+# a step between conversions longer than this many sample periods is a
+# hole where at least one conversion was missed, not jitter
+MAX_STEP = 2.0
+# a read that starts up to this many ns late still picks up the schedule of
+# the one before and catches up on it; Python between two reads takes that
+# long at high rates, which is no reason to throw the samples away
+CATCH_UP = 1000000
+
+
+def command_bytes(pin, differential=False):
+    """
+    Builds the 3-byte MCP3008 command for one conversion.
+    Byte 0 carries the start bit, byte 1 the single/diff flag and channel.
+    For differential reads pin is the channel code of the pair (MCP.P0 is
+    P0-P1, MCP.P1 is P1-P0, ...), the same value AnalogIn uses.
+    """
+    return bytes([0x01, ((not differential) << 7) | (pin << 4), 0x00])
+
+
+def scan_channel(channel):
+    """
+    Turns a scan entry into (channel code, differential). An int is a
+    single-ended pin, a (positive, negative) tuple is a differential pair,
+    which the MCP3008 only supports between neighbouring even/odd pins.
+    """
+    if isinstance(channel, tuple):
+        positive, negative = channel
+        if positive // 2 != negative // 2 or positive == negative:
+            raise ValueError(f"MCP3008 cannot read pair {positive}-{negative}")
+        return positive, True
+    if not 0 <= channel <= 7:
+        raise ValueError(f"MCP3008 has no pin {channel}")
+    return channel, False
+
+
+def decode_counts(raw, num_samples, out=None):
+    """
+    Decodes num_samples 3-byte replies into 10-bit codes in one numpy pass.
+    """
+    frames = np.frombuffer(raw, dtype=np.uint8, count=3 * num_samples)
+    frames = frames.reshape(num_samples, 3)
+    if out is None:
+        out = np.empty(num_samples, dtype=np.uint16)
+    np.bitwise_and(frames[:, 1], 0x03, out=out)
+    out <<= 8
+    out |= frames[:, 2]
+    return out
+
+
+def counts_to_volts(counts, vref=VREF):
+    return counts * (VOLTS_PER_COUNT * vref)
+
+
+def sample_rate_from_stamps(stamps, elapsed_ns=None):
+    """
+    Mean rate over the span of the timestamps. A single sample has no span,
+    so the block duration is used instead.
+    """
+    if len(stamps) > 1 and stamps[-1] > stamps[0]:
+        return (len(stamps) - 1) * 1e9 / (stamps[-1] - stamps[0])
+    if elapsed_ns:
+        return len(stamps) * 1e9 / elapsed_ns
+    return None
+
+
+def jitter_stats(stamps, bins=10):
+    """
+    Summarizes how far sample intervals stray from the median interval.
+    Times are reported in microseconds, the histogram is over the
+    deviations as (counts, bin_edges).
+    """
+    intervals = np.diff(stamps) / 1000.0
+    if len(intervals) == 0:
+        return None
+    period = np.median(intervals)
+    deviation = np.abs(intervals - period)
+    p50, p99 = np.percentile(deviation, [50, 99])
+    return {
+        "period_us": period,
+        "rms_us": np.sqrt(np.mean(deviation**2)),
+        "p50_us": p50,
+        "p99_us": p99,
+        "max_us": np.max(deviation),
+        "histogram": np.histogram(deviation, bins=bins),
+    }
+
+
+def allowed_step(period, max_step=MAX_STEP):
+    """
+    Longest step in ns between two stamps that is not a hole at a sample
+    period of period ns: max_step periods, or one period and the CATCH_UP
+    of a read that started late and caught up on its schedule.
+    """
+    return max(max_step * period, period + CATCH_UP)
+
+
+def find_gaps(stamps, max_step=MAX_STEP, rate=None):
+    """
+    Indices where a new run of contiguous samples starts, wherever the step
+    from the previous stamp is longer than allowed_step of the sample
+    period, 1 / rate or else the median step. Jitter stays well inside
+    that, a hole means conversions were missed, a stalled thread or a read
+    that came too late, and there is no telling what the signal did in it.
+    """
+    if len(stamps) < (2 if rate else 3):
+        return np.empty(0, dtype=np.intp)
+    steps = np.diff(stamps)
+    period = 1e9 / rate if rate else np.median(steps)
+    if period <= 0:
+        return np.empty(0, dtype=np.intp)
+    return np.flatnonzero(steps > allowed_step(period, max_step)) + 1
+
+
+def longest_run(stamps, max_step=MAX_STEP):
+    """
+    (start, stop) of the longest stretch of stamps without a gap.
+    """
+    bounds = np.concatenate(([0], find_gaps(stamps, max_step), [len(stamps)]))
+    longest = int(np.argmax(np.diff(bounds)))
+    return int(bounds[longest]), int(bounds[longest + 1])
+
+
+def resample_uniform(samples, stamps, max_step=MAX_STEP):
+    """
+    Interpolates jittered samples onto an evenly spaced grid with the same
+    number of points and span. Returns (samples, sample_rate), which is
+    what the FFT and zero-crossing code assume they are getting. A line
+    drawn across a hole would hide the cycles in it, so samples with a gap
+    raise ValueError; split them with longest_run first.
+    """
+    samples = np.asarray(samples)
+    gaps = find_gaps(stamps, max_step)
+    if len(gaps):
+        raise ValueError(
+            f"{len(gaps)} gap(s) in the timestamps, "
+            f"the first {(stamps[gaps[0]] - stamps[gaps[0] - 1]) / 1e6:.3f} ms"
+        )
+    if len(samples) < 2 or stamps[-1] <= stamps[0]:
+        return samples, sample_rate_from_stamps(stamps)
+    t = (stamps - stamps[0]) * 1e-9
+    grid = np.linspace(0.0, t[-1], len(samples))
+    return np.interp(grid, t, samples), (len(samples) - 1) / t[-1]
+
+
+class ADCBackend(ABC):
+    """
+    Common block-read interface for anything that produces MCP3008 codes.
+
+    A backend only has to implement _convert, which fills a flat buffer with
+    codes sweep by sweep and stamps every conversion. Single-channel reads,
+    scans and the conversions to volts are shared on top of that, so the
+    scope code runs the same against the board or the simulator.
+    """
+
+    def __init__(self, vref=VREF):
+        self.vref = vref
+        # achieved sample rate of the last block
+        self.sample_rate = None
+        self._stamps = np.empty(0, dtype=np.int64)
+        # conversion times of the last block in perf_counter_ns
+        self.timestamps = self._stamps
+
+    @abstractmethod
+    def _convert(self, channels, num_sweeps, rate, stamps, out):
+        """
+        Performs num_sweeps passes over channels, a list of (channel code,
+        differential) tuples, writing codes into out and perf_counter_ns
+        times into stamps. Returns the time the block took in ns.
+        """
+
+    def close(self):
+        pass
+
+    def _stamp_buffer(self, size):
+        if len(self._stamps) < size:
+            self._stamps = np.empty(size, dtype=np.int64)
+        return self._stamps[:size]
+
+    def read_counts(
+        self, num_samples, pin=0, differential=False, rate=None, out=None, stamps=None
+    ):
+        """
+        Reads num_samples conversions from one channel as uint16 codes.
+        Without rate the ADC runs as fast as it can, with rate every
+        conversion waits for its own deadline so the spacing stays fixed.
+        The perf_counter_ns time of every conversion goes into stamps, or
+        into self.timestamps when no buffer is passed.
+        """
+        if out is None:
+            out = np.empty(num_samples, dtype=np.uint16)
+        if stamps is None:
+            stamps = self.timestamps = self._stamp_buffer(num_samples)
+        elapsed = self._convert([(pin, differential)], num_samples, rate, stamps, out)
+        self.sample_rate = sample_rate_from_stamps(stamps, elapsed)
+        return out
+
+    def read_voltage(self, num_samples, pin=0, differential=False, rate=None):
+        """
+        Same as read_counts but converted to volts, a drop-in for a list of
+        chan.voltage readings.
+        """
+        counts = self.read_counts(num_samples, pin, differential, rate)
+        return counts_to_volts(counts, self.vref)
+
+    def read_scan(self, channels, num_samples, rate=None):
+        """
+        Sweeps a set of inputs round-robin, num_samples sweeps in one pass.
+        channels takes single-ended pins (MCP.P0 to MCP.P7) and differential
+        pairs given as (positive, negative) tuples, e.g. [MCP.P2, (0, 1)].
+        Returns codes shaped (channels, samples), self.timestamps holds the
+        conversion time of each entry in the same shape and sample_rate is
+        the rate of whole sweeps. With rate each sweep starts on its own
+        deadline.
+        """
+        channels = [scan_channel(channel) for channel in channels]
+        count = len(channels) * num_samples
+        counts = np.empty(count, dtype=np.uint16)
+        stamps = self._stamp_buffer(count)
+        elapsed = self._convert(channels, num_samples, rate, stamps, counts)
+        # conversions arrive sweep by sweep, regroup them per channel
+        counts = counts.reshape(num_samples, len(channels)).T.copy()
+        self.timestamps = stamps.reshape(num_samples, len(channels)).T
+        self.sample_rate = sample_rate_from_stamps(self.timestamps[0], elapsed)
+        return counts
+
+    def read_scan_voltage(self, channels, num_samples, rate=None):
+        return counts_to_volts(self.read_scan(channels, num_samples, rate), self.vref)
+
+
+class MCP3008Reader(ADCBackend):
+    """
+    Reads blocks of MCP3008 conversions with a single bus claim per block.
+
+    AnalogIn.voltage locks and reconfigures the bus, toggles chip select and
+    builds a float for every sample. Here the bus is locked once, every
+    conversion is clocked straight into a slice of one preallocated receive
+    buffer and the codes are decoded afterwards with numpy.
+    """
+
+    def __init__(self, spi, cs, baudrate=1000000, vref=VREF):
+        super().__init__(vref)
+        self.spi = spi
+        self.cs = cs
+        self.cs.switch_to_output(value=True)
+        self.baudrate = baudrate
+        self._rx = bytearray(0)
+        # first deadline after the last block
+        self._next = 0
+
+    def close(self):
+        self.cs.deinit()
+        self.spi.deinit()
+
+    def _convert(self, channels, num_sweeps, rate, stamps, out):
+        commands = [command_bytes(pin, differential) for pin, differential in channels]
+        nbytes = 3 * len(commands) * num_sweeps
+        if len(self._rx) < nbytes:
+            self._rx = bytearray(nbytes)
+        rx = memoryview(self._rx)
+        period = round(1e9 / rate) if rate else 0
+
+        spi = self.spi
+        cs = self.cs
+        while not spi.try_lock():
+            pass
+        try:
+            spi.configure(baudrate=self.baudrate, polarity=0, phase=0)
+            write_readinto = spi.write_readinto
+            clock = time.perf_counter_ns
+            start = clock()
+            if period and start - self._next < allowed_step(period) - period:
+                # back in time for the schedule of the last block, carry on
+                # with it so there is no hole or short step between blocks;
+                # deadlines already passed are caught up back to back
+                start = self._next
+            j = 0
+            for k in range(num_sweeps):
+                if period:
+                    deadline = start + k * period
+                    while clock() < deadline:
+                        pass
+                for tx in commands:
+                    cs.value = False
+                    stamps[j] = clock()
+                    write_readinto(tx, rx[3 * j : 3 * j + 3])
+                    cs.value = True
+                    j += 1
+            elapsed = clock() - start
+            self._next = start + num_sweeps * period
+        finally:
+            spi.unlock()
+
+        decode_counts(self._rx, len(commands) * num_sweeps, out)
+        return elapsed
+
+
+def open_mcp3008(cs_pin="D5", baudrate=1000000, vref=VREF):
+    """
+    Builds the SPI bus and a reader for the MCP3008 behind the given chip
+    select. The board libraries are only imported here, so code that just
+    analyzes samples can be imported and run off the Pi.
+    """
+    import board
+    import busio
+    import digitalio
+
+    spi = busio.SPI(clock=board.SCK, MISO=board.MISO, MOSI=board.MOSI)
+    cs = digitalio.DigitalInOut(getattr(board, cs_pin))
+    return MCP3008Reader(spi, cs, baudrate, vref)
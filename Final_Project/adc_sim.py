@@ -0,0 +1,237 @@
+import os
+import sys
+import time
+import numpy as np
+from acquisition import ADCBackend, VOLTS_PER_COUNT, VREF, allowed_step
+
+# 24 SPI clocks per conversion at the reader's default 1 MHz bus
+MAX_RATE = 1000000 / 24
+# seconds at the end of a realtime block spent spinning instead of asleep
+SPIN = 0.002
+
+
+class SignalSource:
+    """
+    A recorded or synthesized waveform in volts that the simulator samples
+    from. It loops, so a whole number of periods of a generated wave stands
+    in for a steady input.
+    """
+
+    def __init__(self, samples, sample_rate):
+        self.samples = np.asarray(samples, dtype=np.float64)
+        self.sample_rate = sample_rate
+
+    def __call__(self, t):
+        index = np.round(t * self.sample_rate).astype(np.int64)
+        return self.samples[index % len(self.samples)]
+
+    @classmethod
+    def from_generator(
+        cls,
+        generator,
+        frequency,
+        sample_rate=100000,
+        duration=1.0,
+        amplitude=1.0,
+        offset=VREF / 2,
+    ):
+        """
+        Wraps one of the generate_*_wave functions from
+        Lab3/test_oscilloscope.py, scaling their -1 to 1 output into the
+        ADC input range.
+        """
+        signal, _ = generator(frequency, sample_rate, duration)
+        return cls(signal * amplitude + offset, sample_rate)
+
+    @classmethod
+    def from_csv(cls, path):
+        """
+        Loads a capture such as mic_detect.py writes, a binary recording or
+        a Timestamp,Voltage CSV.
+        """
+        from recording import load_capture
+
+        timestamps, voltages = load_capture(path)
+        sample_rate = (len(timestamps) - 1) / (timestamps[-1] - timestamps[0])
+        return cls(voltages, sample_rate)
+
+
+def source_voltage(sources, pin, t):
+    """
+    Voltage on pin at time t, which may be a scalar or an array.
+    """
+    source = sources.get(pin, 0.0)
+    if callable(source):
+        return source(t)
+    return np.full(np.shape(t), float(source))
+
+
+def quantize(volts, vref=VREF):
+    return np.clip(np.round(volts / (VOLTS_PER_COUNT * vref)), 0, 1023)
+
+
+class SimulatedMCP3008(ADCBackend):
+    """
+    Stands in for the MCP3008 so the scope code runs on any machine.
+
+    sources maps pins to a SignalSource, any callable of time in seconds or
+    a constant voltage; unconnected pins read 0 V. Readings are quantized to
+    10-bit codes and clipped to the reference like the real chip, and
+    conversions can not come faster than max_rate. In realtime mode a block
+    takes as long as it would on the board, otherwise time only advances
+    on the simulated clock, which is what load tests want. jitter adds
+    normally distributed timing error in seconds to every conversion.
+    """
+
+    def __init__(
+        self,
+        sources,
+        max_rate=MAX_RATE,
+        vref=VREF,
+        noise=0.0,
+        jitter=0.0,
+        realtime=True,
+        seed=None,
+    ):
+        super().__init__(vref)
+        self.sources = sources
+        self.max_rate = max_rate
+        self.noise = noise
+        self.jitter = jitter
+        self.realtime = realtime
+        self._rng = np.random.default_rng(seed)
+        self._epoch = time.perf_counter_ns()
+        self._next = self._epoch
+
+    def _convert(self, channels, num_sweeps, rate, stamps, out):
+        conversion = 1e9 / self.max_rate
+        sweep = max(1e9 / rate if rate else 0.0, len(channels) * conversion)
+        now = time.perf_counter_ns() if self.realtime else self._next
+        # a read that comes in time carries on the schedule of the last one,
+        # like MCP3008Reader, a late one starts a new schedule after a hole
+        start = self._next if now - self._next < allowed_step(sweep) - sweep else now
+        offsets = (
+            np.arange(num_sweeps)[:, None] * sweep
+            + np.arange(len(channels))[None, :] * conversion
+        )
+        if self.jitter:
+            offsets += self._rng.normal(0.0, self.jitter * 1e9, offsets.shape)
+            offsets = np.maximum.accumulate(np.maximum(offsets.ravel(), 0.0))
+            offsets = offsets.reshape(num_sweeps, len(channels))
+        stamps[:] = (start + offsets).astype(np.int64).ravel()
+        if now > start:
+            # conversions already due run back to back until caught up
+            catch_up = now + np.arange(len(stamps)) * conversion
+            np.maximum(stamps, catch_up.astype(np.int64), out=stamps)
+
+        t = (stamps.reshape(num_sweeps, len(channels)) - self._epoch) * 1e-9
+        volts = np.empty(t.shape)
+        for c, (pin, differential) in enumerate(channels):
+            volts[:, c] = source_voltage(self.sources, pin, t[:, c])
+            if differential:
+                # pair codes pick the positive pin, its partner is the other
+                # pin of the even/odd couple
+                volts[:, c] -= source_voltage(self.sources, pin ^ 1, t[:, c])
+        if self.noise:
+            volts += self._rng.normal(0.0, self.noise, volts.shape)
+        np.copyto(out, quantize(volts, self.vref).ravel(), casting="unsafe")
+
+        elapsed = int(num_sweeps * sweep)
+        self._next = start + elapsed
+        if self.realtime:
+            # the board is done once the last conversion is clocked out; the
+            # end is waited out busily like the reader's deadline loop does,
+            # a sleep can overshoot by more than a sample period
+            done = stamps[-1] + conversion
+            remaining = (done - time.perf_counter_ns()) * 1e-9 - SPIN
+            if remaining > 0:
+                time.sleep(remaining)
+            while time.perf_counter_ns() < done:
+                pass
+        return elapsed
+
+
+class SimulatedSPI:
+    """
+    Bus-level stand-in for busio.SPI with an MCP3008 on it.
+
+    Every write_readinto answers a conversion command from the sources and
+    holds the caller for as long as the 24 clocks take at the configured
+    baudrate, the way a blocking SPI transfer does. That lets the real
+    MCP3008Reader loop, or an AnalogIn style per-sample read, run off the
+    Pi with realistic timing.
+    """
+
+    def __init__(self, sources, vref=VREF):
+        self.sources = sources
+        self.vref = vref
+        self.baudrate = 100000
+        self._epoch = time.perf_counter()
+
+    def try_lock(self):
+        return True
+
+    def unlock(self):
+        pass
+
+    def deinit(self):
+        pass
+
+    def configure(self, baudrate=100000, polarity=0, phase=0, bits=8):
+        self.baudrate = baudrate
+
+    def write_readinto(self, tx, rx):
+        start = time.perf_counter()
+        pin = (tx[1] >> 4) & 0x07
+        t = start - self._epoch
+        volts = source_voltage(self.sources, pin, t)
+        if not tx[1] & 0x80:
+            volts -= source_voltage(self.sources, pin ^ 1, t)
+        code = int(quantize(volts, self.vref))
+        rx[0] = 0
+        rx[1] = code >> 8
+        rx[2] = code & 0xFF
+        end = start + 8 * len(tx) / self.baudrate
+        while time.perf_counter() < end:
+            pass
+
+
+class SimulatedChipSelect:
+    def __init__(self):
+        self.value = True
+
+    def switch_to_output(self, value=True):
+        self.value = value
+
+    def deinit(self):
+        pass
+
+
+def load_generators():
+    """
+    Imports the waveform generators from Lab3/test_oscilloscope.py, keyed
+    by shape name.
+    """
+    lab3 = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Lab3")
+    if lab3 not in sys.path:
+        sys.path.append(lab3)
+    import test_oscilloscope
+
+    return {
+        "sine": test_oscilloscope.generate_sine_wave,
+        "square": test_oscilloscope.generate_square_wave,
+        "triangle": test_oscilloscope.generate_triangle_wave,
+    }
+
+
+def simulated_from_args(args, pin=0):
+    """
+    Builds a simulator from command line arguments, either a recorded CSV
+    file or a shape and frequency such as "sine 10".
+    """
+    if len(args) == 1:
+        source = SignalSource.from_csv(args[0])
+    else:
+        shape, frequency = args[0], float(args[1])
+        source = SignalSource.from_generator(load_generators()[shape], frequency)
+    return SimulatedMCP3008({pin: source}, noise=0.005)
@@ -0,0 +1,347 @@
+import lzma
+import struct
+import sys
+import zlib
+import numpy as np
+from acquisition import VOLTS_PER_COUNT, VREF
+from recording import (
+    CHUNK_SIZE,
+    HEADER_SIZE,
+    ChunkedCapture,
+    RecordingWriter,
+    open_capture,
+    read_csv,
+)
+
+ARCHIVE_MAGIC = b"SCOPEARC"
+ARCHIVE_VERSION = 1
+CODECS = ("bitpack", "zlib", "lzma")
+# default effort per codec, zlib level or lzma preset
+LEVELS = {"bitpack": 0, "zlib": 6, "lzma": 6}
+# magic, version, pin, codec, level, chunk size, nominal sample rate,
+# volts per count, time.time() at the start and the perf_counter_ns the
+# timestamps are relative to
+HEADER = struct.Struct("<8sHHBBIdddq")
+# where the index starts, how many chunks it holds and a closing magic
+TRAILER = struct.Struct("<QQ8s")
+TRAILER_MAGIC = b"SCOPEIDX"
+INDEX_DTYPE = np.dtype(
+    [
+        ("offset", "<u8"),
+        ("size", "<u4"),
+        ("count", "<u4"),
+        ("first_stamp", "<i8"),
+        ("first_count", "<u2"),
+        ("reserved", "<u2", (3,)),
+    ]
+)
+
+
+def zigzag(values):
+    # signed to unsigned with small magnitudes staying small
+    values = values.astype(np.int64)
+    return ((values << 1) ^ (values >> 63)).view(np.uint64)
+
+
+def unzigzag(values):
+    values = values.astype(np.uint64)
+    return (values >> np.uint64(1)).view(np.int64) ^ -(values & np.uint64(1)).view(
+        np.int64
+    )
+
+
+def shuffle(values):
+    # byte planes one after the other, the mostly zero high bytes of small
+    # deltas end up in long runs the compressor folds away
+    return values.view(np.uint8).reshape(-1, values.itemsize).T.tobytes()
+
+
+def unshuffle(data, dtype, n):
+    dtype = np.dtype(dtype)
+    planes = np.frombuffer(data, dtype=np.uint8, count=n * dtype.itemsize)
+    return planes.reshape(dtype.itemsize, n).T.copy().view(dtype).ravel()
+
+
+def pack_bits(values):
+    """
+    The low bits of uint64 values, just as many as the largest one needs,
+    packed back to back. Returns the width and the bytes.
+    """
+    width = int(values.max()).bit_length() if len(values) else 0
+    bits = np.unpackbits(
+        values.astype("<u8").view(np.uint8).reshape(-1, 8), axis=1, bitorder="little"
+    )
+    return width, np.packbits(bits[:, :width], bitorder="little").tobytes()
+
+
+def unpack_bits(data, width, n):
+    bits = np.unpackbits(
+        np.frombuffer(data, dtype=np.uint8), count=n * width, bitorder="little"
+    )
+    full = np.zeros((n, 64), dtype=np.uint8)
+    full[:, :width] = bits.reshape(n, width)
+    return np.packbits(full, axis=1, bitorder="little").view("<u8").ravel()
+
+
+def encode_chunk(counts, stamps, codec="zlib", level=None):
+    """
+    Compresses one chunk. The first code and stamp go in the index, what
+    is stored is the code to code step and the change in the spacing of
+    the stamps, both zigzag coded, which for a steady sample rate and a
+    slowly moving signal are small numbers.
+    """
+    level = LEVELS[codec] if level is None else level
+    steps = zigzag(np.diff(counts.astype(np.int64)))
+    spacing = np.diff(stamps)
+    jitter = zigzag(np.diff(spacing, prepend=0))
+    if codec == "bitpack":
+        count_width, packed_counts = pack_bits(steps)
+        stamp_width, packed_stamps = pack_bits(jitter)
+        return bytes([count_width, stamp_width]) + packed_counts + packed_stamps
+    payload = shuffle(steps.astype(np.uint32)) + shuffle(jitter)
+    if codec == "zlib":
+        return zlib.compress(payload, level)
+    if codec == "lzma":
+        return lzma.compress(payload, preset=level)
+    raise ValueError(f"unknown codec {codec}")
+
+
+def decode_chunk(data, count, first_count, first_stamp, codec="zlib"):
+    n = count - 1
+    if codec == "bitpack":
+        count_width, stamp_width = data[0], data[1]
+        split = 2 + (n * count_width + 7) // 8
+        steps = unpack_bits(data[2:split], count_width, n)
+        jitter = unpack_bits(data[split:], stamp_width, n)
+    else:
+        if codec == "zlib":
+            payload = zlib.decompress(data)
+        elif codec == "lzma":
+            payload = lzma.decompress(data)
+        else:
+            raise ValueError(f"unknown codec {codec}")
+        steps = unshuffle(payload[: 4 * n], np.uint32, n)
+        jitter = unshuffle(payload[4 * n :], np.uint64, n)
+
+    counts = np.empty(count, dtype=np.int64)
+    counts[0] = first_count
+    np.cumsum(unzigzag(steps), out=counts[1:])
+    counts[1:] += first_count
+    stamps = np.empty(count, dtype=np.int64)
+    stamps[0] = first_stamp
+    np.cumsum(np.cumsum(unzigzag(jitter)), out=stamps[1:])
+    stamps[1:] += first_stamp
+    return counts.astype(np.uint16), stamps
+
+
+class ArchiveWriter(RecordingWriter):
+    """
+    Streams a capture into a compressed archive. Taking samples works like
+    RecordingWriter, the chunks are encoded on its writer thread and an
+    index of where each one starts goes at the end on close, so any chunk
+    can be decoded on its own later.
+
+    volts_per_count defaults to the MCP3008 scale for vref, a CSV of
+    AnalogIn voltages is 16-bit and needs vref / 65535.
+    """
+
+    def __init__(
+        self,
+        path,
+        sample_rate,
+        pin=0,
+        vref=VREF,
+        chunk_size=CHUNK_SIZE,
+        codec="zlib",
+        level=None,
+        volts_per_count=None,
+        start_time=None,
+        start_ns=None,
+    ):
+        if codec not in CODECS:
+            raise ValueError(f"unknown codec {codec}")
+        self.codec = codec
+        self.level = LEVELS[codec] if level is None else level
+        self.volts_per_count = volts_per_count or VOLTS_PER_COUNT * vref
+        self._index = []
+        super().__init__(path, sample_rate, pin, vref, chunk_size, start_time, start_ns)
+
+    def _header(self, pin, sample_rate, vref):
+        return HEADER.pack(
+            ARCHIVE_MAGIC,
+            ARCHIVE_VERSION,
+            pin,
+            CODECS.index(self.codec),
+            self.level,
+            self.chunk_size,
+            sample_rate,
+            self.volts_per_count,
+            self.start_time,
+            self.start_ns,
+        )
+
+    def _store(self, chunk):
+        count = int(chunk["count"][0])
+        counts = chunk["counts"][0, :count]
+        stamps = chunk["stamps"][0, :count]
+        data = encode_chunk(counts, stamps, self.codec, self.level)
+        self._index.append(
+            (self._file.tell(), len(data), count, stamps[0], counts[0], (0, 0, 0))
+        )
+        self._file.write(data)
+
+    def _finish(self):
+        start = self._file.tell()
+        self._file.write(np.array(self._index, dtype=INDEX_DTYPE).tobytes())
+        self._file.write(TRAILER.pack(start, len(self._index), TRAILER_MAGIC))
+
+
+class Archive(ChunkedCapture):
+    """
+    A compressed archive opened for random access. Only the header and the
+    chunk index are read up front, a read decodes just the chunks it
+    covers, and the last decoded chunk is kept for reads next to it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._read_index()
+        except Exception:
+            self._file.close()
+            raise
+        self._cached = (None, None)
+
+    def _read_index(self):
+        raw = self._file.read(HEADER_SIZE)
+        if len(raw) < HEADER_SIZE or raw[:8] != ARCHIVE_MAGIC:
+            raise ValueError("not a scope archive")
+        fields = HEADER.unpack(raw[: HEADER.size])
+        if fields[1] != ARCHIVE_VERSION:
+            raise ValueError(f"unsupported archive version {fields[1]}")
+        (
+            self.pin,
+            codec,
+            self.level,
+            self.chunk_size,
+            self.sample_rate,
+            self.volts_per_count,
+            self.start_time,
+            self.start_ns,
+        ) = fields[2:]
+        self.codec = CODECS[codec]
+
+        self._file.seek(-TRAILER.size, 2)
+        start, num_chunks, magic = TRAILER.unpack(self._file.read(TRAILER.size))
+        if magic != TRAILER_MAGIC:
+            raise ValueError("archive has no index, it was not closed")
+        self._file.seek(start)
+        self.index = np.frombuffer(
+            self._file.read(num_chunks * INDEX_DTYPE.itemsize), dtype=INDEX_DTYPE
+        )
+        self._offsets = np.concatenate(
+            ([0], np.cumsum(self.index["count"], dtype=np.int64))
+        )
+        self._first = self.index["first_stamp"]
+
+    def close(self):
+        self._file.close()
+
+    def _chunk(self, index):
+        if self._cached[0] != index:
+            entry = self.index[index]
+            self._file.seek(int(entry["offset"]))
+            data = self._file.read(int(entry["size"]))
+            chunk = decode_chunk(
+                data,
+                int(entry["count"]),
+                int(entry["first_count"]),
+                int(entry["first_stamp"]),
+                self.codec,
+            )
+            self._cached = (index, chunk)
+        return self._cached[1]
+
+    def to_volts(self, counts):
+        return counts * self.volts_per_count
+
+
+def read_source(path):
+    """
+    Codes, ns stamps and recording settings of a capture to archive. A CSV
+    of voltages is turned back into the codes behind it, which only works
+    if every voltage is a whole number of counts on some scale: the
+    MCP3008 10-bit one or the 16-bit one AnalogIn reports.
+    """
+    capture = open_capture(path)
+    if capture is not None:
+        with capture:
+            settings = {
+                "sample_rate": capture.sample_rate,
+                "pin": capture.pin,
+                "volts_per_count": capture.to_volts(1),
+                "start_time": capture.start_time,
+                "start_ns": capture.start_ns,
+            }
+            counts, stamps = capture.read()
+        return counts, stamps, settings
+
+    times, voltages = read_csv(path)
+    for volts_per_count in (VOLTS_PER_COUNT * VREF, VREF / 65535):
+        counts = voltages / volts_per_count
+        codes = np.round(counts)
+        if np.all(np.abs(counts - codes) < 1e-6) and codes.max() < 65536:
+            break
+    else:
+        raise ValueError(f"{path} does not hold ADC voltages")
+    stamps = np.round(times * 1e9).astype(np.int64)
+    settings = {
+        "sample_rate": (len(times) - 1) / (times[-1] - times[0]),
+        "pin": 0,
+        "volts_per_count": volts_per_count,
+        "start_time": 0.0,
+        "start_ns": 0,
+    }
+    return codes.astype(np.uint16), stamps, settings
+
+
+def pack(source, path, codec="zlib", level=None, chunk_size=CHUNK_SIZE):
+    """
+    Archives a recording, another archive or a mic_detect CSV. Returns the
+    number of samples.
+    """
+    counts, stamps, settings = read_source(source)
+    with ArchiveWriter(
+        path, codec=codec, level=level, chunk_size=chunk_size, **settings
+    ) as writer:
+        writer.write(counts, stamps + writer.start_ns)
+    return len(counts)
+
+
+def main(args):
+    """
+    python archive.py pack capture.rec|capture.csv capture.sca [codec [level]]
+    python archive.py info capture.sca
+    """
+    if len(args) in (3, 4, 5) and args[0] == "pack":
+        codec = args[3] if len(args) > 3 else "zlib"
+        level = int(args[4]) if len(args) > 4 else None
+        count = pack(args[1], args[2], codec, level)
+        print(f"Archived {count} samples to {args[2]} with {codec}")
+    elif len(args) == 2 and args[0] == "info":
+        with Archive(args[1]) as archive:
+            stored = int(archive.index["size"].sum())
+            print(
+                f"{args[1]}: {len(archive)} samples of pin {archive.pin} over "
+                f"{archive.duration:.3f} s in {len(archive.index)} chunks, "
+                f"{archive.codec} level {archive.level}, "
+                f"{stored / max(len(archive), 1):.2f} bytes per sample"
+            )
+    else:
+        print(main.__doc__)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,156 @@
+"""
+Measures how well the archive codecs compress recorded captures.
+
+    python bench_archive.py
+    python bench_archive.py microphone_data.rec --chunk-size 16384 --json out.json
+
+Each capture, a mic_detect recording or CSV, is archived with every codec
+and level. The table shows the compression against the 10 bytes per
+sample of a binary recording and against the CSV where there is one, the
+encode and decode speed in MB of binary recording per second, the time to
+pull a random 10 ms slice out of the archive and how many MB an hour at
+the capture's rate takes. Every archive is decoded and compared with its
+source, the benchmark fails if one is not lossless.
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+import numpy as np
+from archive import Archive, ArchiveWriter, decode_chunk, encode_chunk, read_source
+from recording import CHUNK_SIZE, open_capture
+
+CONFIGS = [
+    ("bitpack", 0),
+    ("zlib", 1),
+    ("zlib", 6),
+    ("zlib", 9),
+    ("lzma", 0),
+    ("lzma", 6),
+]
+# bytes per sample in a binary recording, an int64 stamp and a uint16 code
+RAW_BYTES = 10
+SLICE_SECONDS = 0.01
+
+
+def best_time(function, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def run_one(counts, stamps, settings, codec, level, chunk_size, repeat, rng):
+    bounds = range(0, len(counts), chunk_size)
+    chunks = [(counts[i : i + chunk_size], stamps[i : i + chunk_size]) for i in bounds]
+    encoded = [encode_chunk(c, s, codec, level) for c, s in chunks]
+    encode_s = best_time(
+        lambda: [encode_chunk(c, s, codec, level) for c, s in chunks], repeat
+    )
+    decode_s = best_time(
+        lambda: [
+            decode_chunk(data, len(c), int(c[0]), int(s[0]), codec)
+            for data, (c, s) in zip(encoded, chunks)
+        ],
+        repeat,
+    )
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "capture.sca")
+        with ArchiveWriter(
+            path, codec=codec, level=level, chunk_size=chunk_size, **settings
+        ) as writer:
+            writer.write(counts, stamps + writer.start_ns)
+        size = os.path.getsize(path)
+        with Archive(path) as archive:
+            lossless = bool(
+                np.array_equal(archive.counts, counts)
+                and np.array_equal(archive.stamps, stamps)
+            )
+            # a fresh decode every time, not the chunk kept from before
+            duration = stamps[-1] / 1e9
+            starts = rng.uniform(0, max(duration - SLICE_SECONDS, 0), 50)
+            slice_s = []
+            for start in starts:
+                archive._cached = (None, None)
+                t0 = time.perf_counter()
+                archive.time_slice(start, start + SLICE_SECONDS)
+                slice_s.append(time.perf_counter() - t0)
+
+    raw_mb = RAW_BYTES * len(counts) / 1e6
+    seconds = (stamps[-1] - stamps[0]) / 1e9
+    return {
+        "codec": codec,
+        "level": level,
+        "samples": len(counts),
+        "bytes": size,
+        "bytes_per_sample": size / len(counts),
+        "ratio_raw": RAW_BYTES * len(counts) / size,
+        "encode_mb_s": raw_mb / encode_s,
+        "decode_mb_s": raw_mb / decode_s,
+        "slice_us": 1e6 * float(np.median(slice_s)),
+        "mb_per_hour": size / seconds * 3600 / 1e6 if seconds > 0 else None,
+        "lossless": lossless,
+    }
+
+
+def run(paths, chunk_size=CHUNK_SIZE, repeat=5, configs=CONFIGS, seed=0):
+    rng = np.random.default_rng(seed)
+    results = []
+    for path in paths:
+        counts, stamps, settings = read_source(path)
+        capture = open_capture(path)
+        if capture is not None:
+            capture.close()
+        csv_bytes = os.path.getsize(path) if capture is None else None
+        for codec, level in configs:
+            r = run_one(counts, stamps, settings, codec, level, chunk_size, repeat, rng)
+            r["capture"] = os.path.basename(path)
+            r["ratio_csv"] = csv_bytes / r["bytes"] if csv_bytes else None
+            results.append(r)
+    return results
+
+
+def print_table(results):
+    print(
+        f"{'capture':<22} {'codec':<8} {'lvl':>3} {'B/sample':>8} {'x raw':>6} "
+        f"{'x csv':>6} {'enc MB/s':>9} {'dec MB/s':>9} {'slice us':>9} "
+        f"{'MB/hour':>8} {'lossless':>8}"
+    )
+    for r in results:
+        ratio_csv = f"{r['ratio_csv']:.1f}" if r["ratio_csv"] else "-"
+        per_hour = f"{r['mb_per_hour']:.1f}" if r["mb_per_hour"] else "-"
+        print(
+            f"{r['capture']:<22} {r['codec']:<8} {r['level']:>3} "
+            f"{r['bytes_per_sample']:>8.2f} {r['ratio_raw']:>6.1f} {ratio_csv:>6} "
+            f"{r['encode_mb_s']:>9.1f} {r['decode_mb_s']:>9.1f} "
+            f"{r['slice_us']:>9.0f} {per_hour:>8} {'yes' if r['lossless'] else 'NO':>8}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser.add_argument(
+        "captures", nargs="*", default=[os.path.join(here, "microphone_data.csv")]
+    )
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = run(args.captures, args.chunk_size, args.repeat)
+    print_table(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if not all(r["lossless"] for r in results):
+        raise SystemExit("an archive did not decode to its source")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""
+Scores the waveform classifiers on a sweep of generated signals, headless.
+
+    python bench_classifier.py
+    python bench_classifier.py --noise 0.05 0.2 --rates 2000 --json out.json
+    python bench_classifier.py --compare out.json
+
+Every combination of shape, frequency, noise level, amplitude, DC offset
+and sample rate becomes trials windows at random phases, quantized by the
+ADC like a real capture, and every detect_waveform_shape variant labels
+the same windows. The report is each variant's accuracy, windows per
+second, peak memory while classifying one batch and its confusion matrix,
+then the accuracy along the --by axis. --compare takes the JSON of an
+earlier run and exits with status 1 when a variant lost more accuracy than
+--tolerance, so a change to the classifier can be checked before it goes
+on the Pi.
+"""
+
+import argparse
+import itertools
+import json
+import sys
+import time
+import tracemalloc
+import numpy as np
+from acquisition import VOLTS_PER_COUNT, VREF
+from adc_sim import quantize
+from classifier import (
+    FLAT,
+    NO_VOLTAGE,
+    SINE,
+    SQUARE,
+    TRIANGLE,
+    UNKNOWN,
+    classify_batch,
+)
+from filters import moving_average
+from final_oscilloscope import detect_waveform_shape
+from synthesis import NoiseSource, waveform
+
+SHAPES = {"sine": SINE, "square": SQUARE, "triangle": TRIANGLE}
+LABELS = [SINE, SQUARE, TRIANGLE, FLAT, NO_VOLTAGE, UNKNOWN]
+AXES = ("shape", "frequency", "noise", "amplitude", "offset", "sample_rate")
+
+
+def classifier_single(windows, sample_rate):
+    return [detect_waveform_shape(w, sample_rate) for w in windows]
+
+
+def classifier_batch(windows, sample_rate):
+    labels, _ = classify_batch(windows, sample_rate)
+    return list(labels)
+
+
+def legacy_shape(data):
+    """
+    The smoothness rules the Lab3 scopes used before they moved to the
+    classifier, kept as the baseline it is scored against.
+    """
+    amplitude = np.max(data) - np.min(data)
+    if amplitude == 0:
+        return FLAT
+    normalized = (data - np.min(data)) / amplitude
+
+    # a sine is smooth everywhere
+    first_diff = np.diff(normalized)
+    second_diff = np.diff(first_diff)
+    if np.all(np.abs(second_diff) < 0.005):
+        return SINE
+
+    # a square sits near its top and bottom
+    high = normalized > 0.85
+    low = normalized < 0.15
+    if np.mean(high) > 0.45 and np.mean(low) > 0.45:
+        return SQUARE
+
+    # a triangle rises and falls slowly
+    rising_slope = np.mean(first_diff[: len(first_diff) // 2])
+    falling_slope = np.mean(first_diff[len(first_diff) // 2 :])
+    if np.abs(rising_slope) < 0.2 and np.abs(falling_slope) < 0.2:
+        return TRIANGLE
+
+    return UNKNOWN
+
+
+def smoothness_rules(denoise):
+    # the Lab3 scripts smoothed with a 50 sample moving average first
+    def detect(windows, sample_rate):
+        labels = []
+        for w in windows:
+            if denoise:
+                w = moving_average(w, 50, mode="same")
+            labels.append(legacy_shape(w))
+        return labels
+
+    return detect
+
+
+VARIANTS = [
+    ("classifier", classifier_single),
+    ("classifier-batch", classifier_batch),
+    ("smoothness", smoothness_rules(denoise=False)),
+    ("smoothness-denoised", smoothness_rules(denoise=True)),
+]
+
+
+def make_windows(shape, frequency, noise, amplitude, offset, sample_rate, count, rng):
+    """
+    count windows of duration 1 s of one condition, as volts on the ADC
+    grid, each starting at a random point in the cycle.
+    """
+    windows = np.empty((count, sample_rate))
+    for window, start in zip(windows, rng.integers(0, sample_rate / frequency, count)):
+        waveform(
+            shape,
+            frequency,
+            sample_rate,
+            sample_rate,
+            amplitude,
+            start=start,
+            out=window,
+        )
+    windows += offset
+    NoiseSource(rng).add(windows, noise)
+    return quantize(windows, VREF) * (VOLTS_PER_COUNT * VREF)
+
+
+def peak_memory(method, windows, sample_rate):
+    tracemalloc.start()
+    method(windows, sample_rate)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def run(grid, trials, variants=VARIANTS, seed=0):
+    """
+    Returns one record per variant and condition with the count of every
+    predicted label, plus the time spent and the peak memory traced over
+    the batch with the most samples.
+    """
+    rng = np.random.default_rng(seed)
+    records = []
+    largest = {}
+    for condition in itertools.product(*(grid[axis] for axis in AXES)):
+        condition = dict(zip(AXES, condition))
+        windows = make_windows(count=trials, rng=rng, **condition)
+        if windows.size > largest.get("size", 0):
+            largest = {"size": windows.size, "windows": windows, **condition}
+        for name, method in variants:
+            start = time.perf_counter()
+            labels = method(windows, condition["sample_rate"])
+            elapsed = time.perf_counter() - start
+            counts = {label: labels.count(label) for label in set(labels)}
+            records.append(
+                {"variant": name, **condition, "seconds": elapsed, "counts": counts}
+            )
+
+    memory = {
+        name: peak_memory(method, largest["windows"], largest["sample_rate"])
+        for name, method in variants
+    }
+    return records, memory
+
+
+def summarize(records, memory):
+    summary = {}
+    for r in records:
+        s = summary.setdefault(
+            r["variant"],
+            {"variant": r["variant"], "windows": 0, "correct": 0, "seconds": 0.0},
+        )
+        truth = SHAPES[r["shape"]]
+        s["windows"] += sum(r["counts"].values())
+        s["correct"] += r["counts"].get(truth, 0)
+        s["seconds"] += r["seconds"]
+    for s in summary.values():
+        s["accuracy"] = s["correct"] / s["windows"]
+        s["windows_per_s"] = s["windows"] / s["seconds"]
+        s["peak_kib"] = memory[s["variant"]] / 1024
+    return list(summary.values())
+
+
+def confusion(records, variant):
+    """
+    Counts per true shape (rows, in SHAPES order) and predicted label
+    (columns, in LABELS order); labels outside LABELS count as UNKNOWN.
+    """
+    matrix = np.zeros((len(SHAPES), len(LABELS)), dtype=int)
+    shapes = list(SHAPES)
+    for r in records:
+        if r["variant"] != variant:
+            continue
+        for label, count in r["counts"].items():
+            column = LABELS.index(label if label in LABELS else UNKNOWN)
+            matrix[shapes.index(r["shape"]), column] += count
+    return matrix
+
+
+def accuracy_by(records, axis):
+    table = {}
+    for r in records:
+        cell = table.setdefault((r["variant"], r[axis]), [0, 0])
+        cell[0] += r["counts"].get(SHAPES[r["shape"]], 0)
+        cell[1] += sum(r["counts"].values())
+    return {key: correct / total for key, (correct, total) in table.items()}
+
+
+def print_report(records, summary, by):
+    print(f"{'variant':<20} {'accuracy':>8} {'windows/s':>10} {'peak KiB':>9}")
+    for s in summary:
+        print(
+            f"{s['variant']:<20} {s['accuracy']:>8.1%} "
+            f"{s['windows_per_s']:>10.0f} {s['peak_kib']:>9.0f}"
+        )
+
+    short = ["sine", "square", "triangle", "flat", "no volt", "unknown"]
+    for s in summary:
+        print(f"\n{s['variant']} (rows true, columns detected)")
+        print(" " * 10 + "".join(f"{name:>9}" for name in short))
+        for shape, row in zip(SHAPES, confusion(records, s["variant"])):
+            print(f"{shape:<10}" + "".join(f"{count:>9}" for count in row))
+
+    by_axis = accuracy_by(records, by)
+    values = sorted({value for _, value in by_axis})
+    print(f"\naccuracy by {by}")
+    print(f"{'variant':<20}" + "".join(f"{value:>10}" for value in values))
+    for s in summary:
+        cells = [by_axis[(s["variant"], value)] for value in values]
+        print(f"{s['variant']:<20}" + "".join(f"{cell:>10.1%}" for cell in cells))
+
+
+def compare(summary, path, tolerance):
+    """
+    Prints the change against an earlier run and returns whether any
+    variant lost more than tolerance of accuracy.
+    """
+    with open(path) as f:
+        before = {s["variant"]: s for s in json.load(f)["summary"]}
+    regressed = False
+    print(f"\nagainst {path}")
+    for s in summary:
+        old = before.get(s["variant"])
+        if old is None:
+            print(f"{s['variant']:<20} new")
+            continue
+        change = s["accuracy"] - old["accuracy"]
+        speed = s["windows_per_s"] / old["windows_per_s"]
+        worse = change < -tolerance
+        regressed |= worse
+        print(
+            f"{s['variant']:<20} accuracy {change:+.1%} speed x{speed:.2f}"
+            + ("  REGRESSION" if worse else "")
+        )
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--shapes", nargs="+", default=list(SHAPES))
+    parser.add_argument(
+        "--frequencies", type=float, nargs="+", default=[5, 20, 60, 150]
+    )
+    parser.add_argument(
+        "--noise", type=float, nargs="+", default=[0.01, 0.05, 0.1, 0.2]
+    )
+    parser.add_argument("--amplitudes", type=float, nargs="+", default=[0.5, 1.0])
+    parser.add_argument("--offsets", type=float, nargs="+", default=[1.65, 2.0])
+    parser.add_argument("--rates", type=int, nargs="+", default=[1000, 2000])
+    parser.add_argument("--trials", type=int, default=10)
+    parser.add_argument("--variants", nargs="+", default=[name for name, _ in VARIANTS])
+    parser.add_argument("--by", choices=AXES, default="noise")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--compare", help="JSON of an earlier run to check against")
+    parser.add_argument("--tolerance", type=float, default=0.01)
+    args = parser.parse_args()
+
+    grid = {
+        "shape": args.shapes,
+        "frequency": args.frequencies,
+        "noise": args.noise,
+        "amplitude": args.amplitudes,
+        "offset": args.offsets,
+        "sample_rate": args.rates,
+    }
+    variants = [(name, m) for name, m in VARIANTS if name in args.variants]
+    records, memory = run(grid, args.trials, variants)
+    summary = summarize(records, memory)
+    print_report(records, summary, args.by)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"grid": grid, "summary": summary, "records": records}, f)
+    if args.compare and compare(summary, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Compares frequency estimators on windows of different lengths.
+
+    python bench_frequency.py
+    python bench_frequency.py --lengths 128 512 --trials 500 --json out.json
+
+Every method sees the same noisy, ADC-quantized sine, square and triangle
+windows at random frequencies and phases, and is scored on its error in Hz
+and the time it takes per window. The summary lists the shortest window at
+which each method stays inside the scope's 1 Hz change threshold.
+"""
+
+import argparse
+import json
+import time
+import numpy as np
+from adc_sim import load_generators, quantize
+from acquisition import VOLTS_PER_COUNT, VREF
+from final_oscilloscope import calculate_frequency
+from frequency import StreamingFrequencyEstimator
+from spectrum import peak_frequency
+
+SAMPLE_RATE = 2000
+NOISE = 0.005
+# the scope reprints when the frequency moves by more than this
+THRESHOLD_HZ = 1.0
+
+
+def zero_crossing(windows, sample_rate):
+    return np.array([calculate_frequency(w, sample_rate) for w in windows])
+
+
+def interpolated_crossing(windows, sample_rate):
+    estimates = []
+    for w in windows:
+        frequency = StreamingFrequencyEstimator(sample_rate, span=np.inf).update(w)
+        estimates.append(np.nan if frequency is None else frequency)
+    return np.array(estimates)
+
+
+def spectral(method, window):
+    def estimate(windows, sample_rate):
+        return peak_frequency(windows, sample_rate, method, window)
+
+    return estimate
+
+
+METHODS = [
+    ("zero-crossing", zero_crossing),
+    ("crossing-interp", interpolated_crossing),
+    ("fft-bin", spectral("bin", "hann")),
+    ("parabolic-hann", spectral("parabolic", "hann")),
+    ("quinn", spectral("quinn", "boxcar")),
+    ("jacobsen-hann", spectral("jacobsen", "hann")),
+]
+
+
+def make_windows(length, trials, rng, low=5.0, high=200.0):
+    """
+    trials windows of every shape with their true frequencies, as volts
+    on the ADC grid.
+    """
+    generators = load_generators()
+    windows, frequencies = [], []
+    duration = length / SAMPLE_RATE
+    for shape in ("sine", "square", "triangle"):
+        for frequency in rng.uniform(low, high, trials):
+            # start somewhere in the cycle, not always on a crossing
+            delay = rng.uniform(0, 1 / frequency)
+            signal, _ = generators[shape](frequency, SAMPLE_RATE, duration + delay)
+            signal = signal[-length:] + rng.normal(0, NOISE, length)
+            windows.append(quantize(VREF / 2 + signal, VREF) * VOLTS_PER_COUNT * VREF)
+            frequencies.append(frequency)
+    return np.array(windows), np.array(frequencies)
+
+
+def run(lengths, trials, seed=0):
+    rng = np.random.default_rng(seed)
+    results = []
+    for length in lengths:
+        windows, truth = make_windows(length, trials, rng)
+        for name, method in METHODS:
+            start = time.perf_counter()
+            estimates = method(windows, SAMPLE_RATE)
+            elapsed = time.perf_counter() - start
+            error = np.abs(estimates - truth)
+            error = np.where(np.isnan(error), np.inf, error)
+            results.append(
+                {
+                    "method": name,
+                    "length": length,
+                    "window_ms": 1000 * length / SAMPLE_RATE,
+                    "rms_error_hz": float(
+                        np.sqrt(np.mean(error[np.isfinite(error)] ** 2))
+                    ),
+                    "p95_error_hz": float(np.percentile(error, 95, method="higher")),
+                    "failed": int(np.sum(~np.isfinite(error))),
+                    "us_per_window": 1e6 * elapsed / len(windows),
+                }
+            )
+    return results
+
+
+def shortest_windows(results):
+    """
+    Shortest window per method whose 95th percentile error is inside the
+    threshold, None when no length made it.
+    """
+    best = {}
+    for r in sorted(results, key=lambda r: r["length"]):
+        best.setdefault(r["method"], None)
+        if best[r["method"]] is None and r["p95_error_hz"] <= THRESHOLD_HZ:
+            best[r["method"]] = r["length"]
+    return best
+
+
+def print_table(results):
+    print(
+        f"{'method':<16} {'length':>6} {'ms':>6} {'rms Hz':>8} {'p95 Hz':>8} "
+        f"{'failed':>6} {'us':>7}"
+    )
+    for r in results:
+        print(
+            f"{r['method']:<16} {r['length']:>6} {r['window_ms']:>6.0f} "
+            f"{r['rms_error_hz']:>8.3f} {r['p95_error_hz']:>8.3f} "
+            f"{r['failed']:>6} {r['us_per_window']:>7.1f}"
+        )
+    print()
+    print(f"Shortest window within {THRESHOLD_HZ} Hz (p95):")
+    for method, length in shortest_windows(results).items():
+        found = f"{length} samples" if length else "none tried"
+        print(f"  {method:<16} {found}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--lengths", type=int, nargs="+", default=[128, 256, 512, 1024, 2048]
+    )
+    parser.add_argument("--trials", type=int, default=200)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = run(args.lengths, args.trials)
+    print_table(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {"results": results, "shortest": shortest_windows(results)},
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Measures how the scope analysis scales with the number of worker processes.
+
+    python bench_parallel.py
+    python bench_parallel.py --windows 256 --samples 4096 --workers 1 2 4
+
+Every run analyzes the same batch of noisy sine, square and triangle
+windows with analyze_windows through a ParallelAnalyzer, after one warm-up
+job to start the pool. Workers 1 is the in-process baseline. The table
+shows windows per second and the speedup over that baseline.
+"""
+
+import argparse
+import json
+import os
+import time
+import numpy as np
+from parallel import ParallelAnalyzer, analyze_windows
+
+SAMPLE_RATE = 2000
+
+
+def make_windows(count, num_samples, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(num_samples) / SAMPLE_RATE
+    phase = rng.uniform(5, 200, (count, 1)) * t + rng.uniform(0, 1, (count, 1))
+    shapes = [
+        np.sin(2 * np.pi * phase),
+        np.sign(np.sin(2 * np.pi * phase)),
+        4 * np.abs(phase % 1 - 0.5) - 1,
+    ]
+    pick = np.arange(count) % len(shapes)
+    signal = np.choose(pick[:, None], shapes)
+    return 1.65 + signal + 0.02 * rng.standard_normal((count, num_samples))
+
+
+def run(windows, workers, repeat):
+    with ParallelAnalyzer(max_workers=workers, min_parallel=0) as analyzer:
+        analyzer.map(analyze_windows, windows, SAMPLE_RATE)
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            analyzer.map(analyze_windows, windows, SAMPLE_RATE)
+            times.append(time.perf_counter() - start)
+    best = min(times)
+    return {"workers": workers, "seconds": best, "windows_per_s": len(windows) / best}
+
+
+def print_table(results):
+    baseline = results[0]["seconds"]
+    print(f"{'workers':>8} {'ms':>9} {'windows/s':>10} {'speedup':>8}")
+    for r in results:
+        print(
+            f"{r['workers']:>8} {1000 * r['seconds']:>9.1f} "
+            f"{r['windows_per_s']:>10.0f} {baseline / r['seconds']:>8.2f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--windows", type=int, default=128)
+    parser.add_argument("--samples", type=int, default=2000)
+    parser.add_argument(
+        "--workers", type=int, nargs="+", default=range(1, (os.cpu_count() or 1) + 1)
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    windows = make_windows(args.windows, args.samples)
+    results = [run(windows, workers, args.repeat) for workers in args.workers]
+    print_table(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
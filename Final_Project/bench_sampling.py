@@ -0,0 +1,175 @@
+"""
+Compares ways of pacing MCP3008 sampling on the simulated SPI bus.
+
+    python bench_sampling.py
+    python bench_sampling.py --rates 1000 5000 --seconds 0.5 --json out.json
+
+Every strategy reads the same simulated sine through a bus that blocks for
+the real transfer time, and is scored on the rate it actually reached, the
+spread of its sample intervals and the CPU time it burned per sample.
+"""
+
+import argparse
+import json
+import time
+import numpy as np
+from acquisition import (
+    MCP3008Reader,
+    VOLTS_PER_COUNT,
+    VREF,
+    command_bytes,
+    jitter_stats,
+    sample_rate_from_stamps,
+)
+from adc_sim import SimulatedChipSelect, SimulatedSPI
+
+BAUDRATE = 1000000
+# leave the last stretch before a deadline to spinning, sleep overshoots
+SPIN_MARGIN_NS = 1000000
+
+
+def analog_in_reader(spi, cs, pin=0):
+    """
+    The per-sample path AnalogIn.voltage takes: lock and configure the bus,
+    one transfer, unlock, convert to a float.
+    """
+    tx = command_bytes(pin)
+    rx = bytearray(3)
+
+    def read():
+        while not spi.try_lock():
+            pass
+        try:
+            spi.configure(baudrate=BAUDRATE, polarity=0, phase=0)
+            cs.value = False
+            spi.write_readinto(tx, rx)
+            cs.value = True
+        finally:
+            spi.unlock()
+        return (((rx[1] & 0x03) << 8) | rx[2]) * VOLTS_PER_COUNT * VREF
+
+    return read
+
+
+def sleep_paced(read, num_samples, rate):
+    # what oscilloscope.sample_waveform and mic_detect.main do
+    stamps = np.empty(num_samples, dtype=np.int64)
+    values = np.empty(num_samples)
+    for k in range(num_samples):
+        stamps[k] = time.perf_counter_ns()
+        values[k] = read()
+        time.sleep(1 / rate)
+    return stamps, values
+
+
+def busy_wait(read, num_samples, rate):
+    # spin until one period after the previous sample, errors accumulate
+    period = round(1e9 / rate)
+    clock = time.perf_counter_ns
+    stamps = np.empty(num_samples, dtype=np.int64)
+    values = np.empty(num_samples)
+    due = clock()
+    for k in range(num_samples):
+        now = clock()
+        while now < due:
+            now = clock()
+        stamps[k] = now
+        values[k] = read()
+        due = now + period
+    return stamps, values
+
+
+def absolute_deadline(read, num_samples, rate):
+    # sleep until just before the k-th deadline from the start, then spin
+    period = round(1e9 / rate)
+    clock = time.perf_counter_ns
+    stamps = np.empty(num_samples, dtype=np.int64)
+    values = np.empty(num_samples)
+    start = clock()
+    for k in range(num_samples):
+        deadline = start + k * period
+        remaining = deadline - clock()
+        if remaining > SPIN_MARGIN_NS:
+            time.sleep((remaining - SPIN_MARGIN_NS) * 1e-9)
+        now = clock()
+        while now < deadline:
+            now = clock()
+        stamps[k] = now
+        values[k] = read()
+    return stamps, values
+
+
+def block_read(reader, num_samples, rate):
+    counts = reader.read_counts(num_samples, rate=rate)
+    return reader.timestamps.copy(), counts
+
+
+def measure(strategy, source, num_samples, rate):
+    cpu = time.process_time_ns()
+    stamps, _ = strategy(source, num_samples, rate)
+    cpu = time.process_time_ns() - cpu
+    achieved = sample_rate_from_stamps(stamps)
+    jitter = jitter_stats(stamps)
+    return {
+        "target_hz": rate,
+        "achieved_hz": achieved,
+        "rate_error_pct": 100 * (achieved - rate) / rate,
+        "jitter_p50_us": jitter["p50_us"],
+        "jitter_p99_us": jitter["p99_us"],
+        "jitter_max_us": jitter["max_us"],
+        "cpu_us_per_sample": cpu / num_samples / 1000,
+    }
+
+
+def run(rates, seconds):
+    spi = SimulatedSPI({0: lambda t: VREF / 2 + np.sin(2 * np.pi * 10 * t)})
+    cs = SimulatedChipSelect()
+    per_sample = analog_in_reader(spi, cs)
+    reader = MCP3008Reader(spi, cs, BAUDRATE)
+    strategies = [
+        ("sleep-paced", sleep_paced, per_sample),
+        ("busy-wait", busy_wait, per_sample),
+        ("absolute-deadline", absolute_deadline, per_sample),
+        ("block-read", block_read, reader),
+    ]
+
+    results = []
+    for rate in rates:
+        num_samples = max(int(rate * seconds), 2)
+        for name, strategy, source in strategies:
+            result = measure(strategy, source, num_samples, rate)
+            result["strategy"] = name
+            results.append(result)
+    return results
+
+
+def print_table(results):
+    print(
+        f"{'strategy':<18} {'target':>7} {'achieved':>9} {'error':>7} "
+        f"{'p50 us':>7} {'p99 us':>8} {'max us':>8} {'cpu us':>7}"
+    )
+    for r in results:
+        print(
+            f"{r['strategy']:<18} {r['target_hz']:>7} {r['achieved_hz']:>9.1f} "
+            f"{r['rate_error_pct']:>6.1f}% {r['jitter_p50_us']:>7.1f} "
+            f"{r['jitter_p99_us']:>8.1f} {r['jitter_max_us']:>8.1f} "
+            f"{r['cpu_us_per_sample']:>7.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rates", type=int, nargs="+", default=[500, 1000, 2000])
+    parser.add_argument("--seconds", type=float, default=1.0)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = run(args.rates, args.seconds)
+    print_table(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Measures how long the analysis modules take to import in a fresh Python.
+
+    python bench_startup.py
+    python bench_startup.py --modules classifier scipy.stats --repeat 10
+
+Each import runs in its own interpreter so nothing is cached between runs.
+The table shows the median wall time of the import alone and whether it
+pulled in SciPy, which is what makes the scopes slow to start on a Pi.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import numpy as np
+
+MODULES = [
+    "numpy",
+    "scipy.stats",
+    "scipy.signal",
+    "moments",
+    "filters",
+    "spectrum",
+    "classifier",
+    "frequency",
+    "final_oscilloscope",
+]
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(elapsed, "scipy" in sys.modules)
+"""
+
+
+def import_time(module, repeat):
+    here = os.path.dirname(os.path.abspath(__file__))
+    times = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module)],
+            cwd=here,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.split()
+        times.append(float(output[0]))
+    return {
+        "module": module,
+        "median_ms": 1000 * float(np.median(times)),
+        "max_ms": 1000 * max(times),
+        "loads_scipy": output[1] == "True",
+    }
+
+
+def print_table(results):
+    print(f"{'module':<20} {'median ms':>10} {'max ms':>8} {'scipy':>6}")
+    for r in results:
+        print(
+            f"{r['module']:<20} {r['median_ms']:>10.1f} {r['max_ms']:>8.1f} "
+            f"{'yes' if r['loads_scipy'] else 'no':>6}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--modules", nargs="+", default=MODULES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = [import_time(module, args.repeat) for module in args.modules]
+    print_table(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import threading
+import numpy as np
+from acquisition import counts_to_volts, longest_run, resample_uniform
+
+
+class BackgroundCapture:
+    """
+    Samples the ADC on a worker thread so analysis overlaps acquisition.
+
+    The worker fills a small ring of window buffers back to back. A finished
+    window is published as the ready one and get() hands it to the analyzer
+    while the worker is already filling the next buffer. With three buffers
+    the worker never has to wait: one is being filled, one is ready and one
+    may still be in the hands of the consumer.
+    """
+
+    def __init__(
+        self, reader, num_samples, pin=0, differential=False, rate=None, num_buffers=3
+    ):
+        self.reader = reader
+        self.num_samples = num_samples
+        self.pin = pin
+        self.differential = differential
+        self.rate = rate
+        self._buffers = [
+            np.empty(num_samples, dtype=np.uint16) for _ in range(num_buffers)
+        ]
+        self._stamps = [
+            np.empty(num_samples, dtype=np.int64) for _ in range(num_buffers)
+        ]
+        self._rates = [None] * num_buffers
+        self._ready = None  # index of the newest finished window
+        self._reading = None  # index the consumer is converting
+        self._seq = 0  # number of windows published so far
+        self._last_seq = 0  # newest window handed to the consumer
+        self._error = None
+        self._cond = threading.Condition()
+        # set by arm() and configure() to wake a worker waiting on a spent
+        # triggered reader
+        self._wake = False
+        self._running = False
+        self._thread = None
+        # windows that were overwritten before anyone read them
+        self.dropped = 0
+        # uniform windows cut down to their longest run without a hole
+        self.split = 0
+        # perf_counter_ns times of the window most recently returned
+        self.timestamps = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        # a triggered reader can wait a long time for an edge
+        cancel = getattr(self.reader, "cancel", None)
+        if cancel is not None:
+            cancel()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def configure(self, num_samples=None, rate=None):
+        """
+        Changes the window length and sample rate on the fly. The window
+        being filled finishes with the old settings, the next one uses the
+        new ones.
+        """
+        with self._cond:
+            if num_samples is not None:
+                self.num_samples = num_samples
+            if rate is not None:
+                self.rate = rate
+            self._wake = True
+            self._cond.notify_all()
+
+    def arm(self):
+        """
+        Re-arms a triggered reader in single mode for another window and
+        wakes the worker, which sleeps while the reader is spent.
+        """
+        with self._cond:
+            self.reader.arm()
+            self._wake = True
+            self._cond.notify_all()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _run(self):
+        fill = 0
+        try:
+            while self._running:
+                with self._cond:
+                    num_samples, rate = self.num_samples, self.rate
+                # after configure() slots are resized as they come up for
+                # filling, the ready and the in-use ones are left alone
+                if len(self._buffers[fill]) != num_samples:
+                    self._buffers[fill] = np.empty(num_samples, dtype=np.uint16)
+                    self._stamps[fill] = np.empty(num_samples, dtype=np.int64)
+                window = self.reader.read_counts(
+                    num_samples,
+                    self.pin,
+                    self.differential,
+                    rate,
+                    out=self._buffers[fill],
+                    stamps=self._stamps[fill],
+                )
+                if window is None:
+                    # a triggered reader that saw no edge, nothing to publish;
+                    # a spent single shot has nothing more until it is armed
+                    if getattr(self.reader, "spent", False):
+                        with self._cond:
+                            self._cond.wait_for(lambda: self._wake or not self._running)
+                            self._wake = False
+                    continue
+                with self._cond:
+                    if self._ready is not None and self._seq > self._last_seq:
+                        self.dropped += 1
+                    self._rates[fill] = self.reader.sample_rate
+                    self._ready = fill
+                    self._seq += 1
+                    self._cond.notify_all()
+                    # next buffer that is neither ready nor being read
+                    fill = next(
+                        i
+                        for i in range(len(self._buffers))
+                        if i != self._ready and i != self._reading
+                    )
+        except Exception as e:
+            with self._cond:
+                self._error = e
+                self._running = False
+                self._cond.notify_all()
+
+    def _take(self, convert, timeout):
+        with self._cond:
+            if not self._cond.wait_for(
+                lambda: self._seq > self._last_seq or self._error or not self._running,
+                timeout,
+            ):
+                return None
+            if self._error is not None:
+                raise self._error
+            if self._seq == self._last_seq:
+                return None
+            index = self._ready
+            counts = self._buffers[index]
+            stamps = self._stamps[index]
+            sample_rate = self._rates[index]
+            self._reading = index
+            self._last_seq = self._seq
+        try:
+            self.timestamps = stamps.copy()
+            return convert(counts), sample_rate
+        finally:
+            with self._cond:
+                self._reading = None
+
+    def get_counts(self, timeout=None):
+        """
+        Waits for a window newer than the last one returned and gives back
+        (counts, sample_rate). The counts are a copy, so the worker can
+        reuse the buffer right away, and the conversion times land in
+        self.timestamps. Returns None on timeout.
+        """
+        return self._take(np.copy, timeout)
+
+    def get(self, timeout=None, uniform=False):
+        """
+        Same as get_counts but converted to volts, a drop-in for a freshly
+        sampled window. With uniform the window is interpolated from its
+        timestamps onto an even grid first, so scheduling jitter does not
+        skew the FFT and zero-crossing estimates. A window with a hole in
+        it is cut down to its longest contiguous run and self.timestamps
+        to match, so callers that carry state across windows see the
+        break in the stamps and can start over. A run too short to have a
+        rate comes back with a sample_rate of None.
+        """
+        window = self._take(
+            lambda counts: counts_to_volts(counts, self.reader.vref), timeout
+        )
+        if window is None or not uniform:
+            return window
+        samples = window[0]
+        start, stop = longest_run(self.timestamps)
+        if stop - start < len(samples):
+            self.split += 1
+            samples = samples[start:stop]
+            self.timestamps = self.timestamps[start:stop]
+        return resample_uniform(samples, self.timestamps)
@@ -0,0 +1,72 @@
+import numpy as np
+from harmonics import harmonic_features, ideal_thd
+
+NO_VOLTAGE = "No Voltage"
+FLAT = "Unknown Waveform (Flat Line)"
+SQUARE = "Square Wave"
+SINE = "Sine Wave"
+TRIANGLE = "Triangle Wave"
+UNKNOWN = "Unknown Waveform"
+
+# harmonic distortion of the ideal shapes over the harmonics that are read,
+# and how far a window may sit from one before it counts as another
+NUM_HARMONICS = 8
+IDEAL_THD = {
+    SQUARE: ideal_thd("square", NUM_HARMONICS),
+    SINE: ideal_thd("sine", NUM_HARMONICS),
+    TRIANGLE: ideal_thd("triangle", NUM_HARMONICS),
+}
+THD_SCALE = 0.03
+# a square has no even harmonics, which keeps sawtooth-like shapes out
+MIN_ODD_EVEN = 2.0
+
+
+def classify_batch(windows, sample_rate, min_voltage=1.1, features=None):
+    """
+    Classifies every row of a (windows, samples) array from its harmonic
+    signature: lots of odd-only distortion is a square wave, next to none a
+    sine, the little in between a triangle. Heavy distortion with even
+    harmonics in it, a sawtooth say, is none of them and comes out as
+    unknown. Returns an array of shape labels and an array of confidences
+    between 0 and 1, which measure how much closer a window's THD is to its
+    label's ideal shape than to the others. features takes the
+    harmonic_features of the windows if the caller already has them.
+    """
+    windows = np.atleast_2d(np.asarray(windows, dtype=np.float64))
+    if features is None:
+        features = harmonic_features(windows, sample_rate, NUM_HARMONICS)
+    thd = np.nan_to_num(features["thd"], nan=0.0)
+
+    # soft assignment to the ideal distortion levels
+    names = list(IDEAL_THD)
+    ideal = np.array([IDEAL_THD[name] for name in names])
+    distance = ((thd[:, None] - ideal) / THD_SCALE) ** 2
+    weights = np.exp(-0.5 * (distance - distance.min(axis=-1, keepdims=True)))
+
+    # even harmonics rule out a square, its share goes to an unknown shape
+    odd = features["odd_even"] > MIN_ODD_EVEN
+    square = names.index(SQUARE)
+    names.append(UNKNOWN)
+    weights = np.column_stack((weights, np.where(odd, 0.0, weights[:, square])))
+    weights[~odd, square] = 0.0
+    weights /= weights.sum(axis=-1, keepdims=True)
+
+    picked = np.argmax(weights, axis=-1)
+    labels = np.array(names, dtype=object)[picked]
+    confidence = weights[np.arange(len(labels)), picked]
+
+    maximum = windows.max(axis=-1)
+    flat = maximum == windows.min(axis=-1)
+    quiet = maximum < min_voltage
+    labels[flat] = FLAT
+    labels[quiet] = NO_VOLTAGE
+    confidence[flat | quiet] = 1.0
+    return labels, confidence
+
+
+def classify(samples, sample_rate, min_voltage=1.1):
+    """
+    Single-window form, returns the label and its confidence.
+    """
+    labels, confidence = classify_batch(samples[None, :], sample_rate, min_voltage)
+    return labels[0], confidence[0]
@@ -0,0 +1,59 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def lowpass_taps(factor, taps_per_phase=8, beta=6.0):
+    """
+    Kaiser-windowed sinc low-pass for decimating by factor. The cutoff sits
+    a little below the new Nyquist frequency so the transition band ends
+    before anything can fold back. Gain is 1 at DC.
+    """
+    num_taps = factor * taps_per_phase + 1
+    n = np.arange(num_taps) - (num_taps - 1) / 2
+    cutoff = 0.8 / factor  # fraction of the input Nyquist frequency
+    taps = cutoff * np.sinc(cutoff * n) * np.kaiser(num_taps, beta)
+    return taps / np.sum(taps)
+
+
+class Decimator:
+    """
+    Streaming FIR decimator that keeps its filter history between blocks.
+
+    Only every factor-th output is computed, the polyphase saving, and each
+    block is filtered in one matrix product over a strided view of the
+    history plus the new samples. Blocks of any length can be fed in and
+    the output lines up as if the whole stream had been filtered at once.
+    """
+
+    def __init__(self, factor, taps=None):
+        self.factor = factor
+        self.taps = lowpass_taps(factor) if taps is None else np.asarray(taps)
+        # reversed so a window of samples dotted with it is the convolution
+        self._kernel = self.taps[::-1].copy()
+        self.reset()
+
+    def reset(self):
+        self._history = None
+        # position in the next block of the next sample to keep
+        self._offset = 0
+
+    @property
+    def delay(self):
+        """Group delay of the filter in input samples."""
+        return (len(self.taps) - 1) / 2
+
+    def process(self, block):
+        block = np.asarray(block, dtype=np.float64)
+        if len(block) == 0 or self.factor == 1:
+            return block
+        if self._history is None:
+            # start from steady state on the first sample, not from zeros,
+            # so a DC offset does not ring through the first outputs
+            self._history = np.full(len(self.taps) - 1, block[0])
+        x = np.concatenate((self._history, block))
+        windows = sliding_window_view(x, len(self.taps))[self._offset :: self.factor]
+        out = windows @ self._kernel
+
+        self._offset = (self._offset - len(block)) % self.factor
+        self._history = x[len(x) - (len(self.taps) - 1) :]
+        return out
@@ -0,0 +1,167 @@
+import math
+import numpy as np
+
+MODES = ("valid", "same")
+
+
+def moving_average(samples, window_size=5, mode="valid"):
+    """
+    Boxcar average along the last axis from a running sum, so it costs the
+    same for any window size. "valid" matches np.convolve in that mode and
+    comes back empty when the window is longer than the samples. "same"
+    keeps the length and lines up like np.convolve's "same", but near the
+    ends it averages the samples that are there instead of padding with
+    zeros, so the edges do not droop towards 0; a window longer than the
+    samples is clipped to them the same way.
+    """
+    if mode not in MODES:
+        raise ValueError(f"unknown mode {mode}")
+    if window_size < 1:
+        raise ValueError(f"window_size must be at least 1, not {window_size}")
+    samples = np.asarray(samples, dtype=np.float64)
+    n = samples.shape[-1]
+    csum = np.cumsum(samples, axis=-1)
+    csum = np.concatenate((np.zeros(csum.shape[:-1] + (1,)), csum), axis=-1)
+    if mode == "valid":
+        if window_size > n:
+            return np.empty(samples.shape[:-1] + (0,))
+        return (csum[..., window_size:] - csum[..., :-window_size]) / window_size
+
+    # output i averages inputs i + lead - window_size + 1 up to i + lead,
+    # the part of that window inside the data
+    lead = (window_size - 1) // 2
+    end = np.minimum(np.arange(n) + lead + 1, n)
+    start = np.maximum(np.arange(n) + lead + 1 - window_size, 0)
+    return (csum[..., end] - csum[..., start]) / (end - start)
+
+
+class MovingAverage:
+    """
+    Streaming boxcar average. Each output is the mean of the last
+    window_size inputs, fewer while the stream is younger than that, and
+    the tail of every block is kept so the next one continues smoothly.
+    """
+
+    def __init__(self, window_size=5):
+        self.window_size = window_size
+        self.reset()
+
+    def reset(self):
+        self._history = np.empty(0)
+
+    def process(self, block):
+        block = np.asarray(block, dtype=np.float64)
+        if len(block) == 0:
+            return block
+        x = np.concatenate((self._history, block))
+        csum = np.concatenate(([0.0], np.cumsum(x)))
+        end = np.arange(len(self._history), len(x)) + 1
+        start = np.maximum(end - self.window_size, 0)
+        self._history = x[max(len(x) - (self.window_size - 1), 0) :]
+        return (csum[end] - csum[start]) / (end - start)
+
+
+def single_pole_coefficients(cutoff, sample_rate):
+    """
+    b, a of y[n] = y[n-1] + alpha * (x[n] - y[n-1]), the exponential
+    smoother with a -3 dB point near cutoff Hz.
+    """
+    alpha = 1 - math.exp(-2 * math.pi * cutoff / sample_rate)
+    return np.array([alpha]), np.array([1.0, alpha - 1])
+
+
+def biquad_coefficients(cutoff, sample_rate, q=1 / math.sqrt(2)):
+    """
+    b, a of a second-order low-pass from the audio EQ cookbook, Butterworth
+    with the default q.
+    """
+    w0 = 2 * math.pi * cutoff / sample_rate
+    alpha = math.sin(w0) / (2 * q)
+    cos_w0 = math.cos(w0)
+    b = np.array([(1 - cos_w0) / 2, 1 - cos_w0, (1 - cos_w0) / 2])
+    a = np.array([1 + alpha, -2 * cos_w0, 1 - alpha])
+    return b / a[0], a / a[0]
+
+
+class RecursiveFilter:
+    """
+    Streaming IIR filter that keeps its state between blocks, O(1) work
+    per sample whatever the cutoff. The state starts as if the first
+    sample had always been there, so the output does not climb up from 0.
+    process() runs blocks through scipy's lfilter, step() takes a single
+    reading in plain Python for loops that get one at a time, and the two
+    share their state.
+    """
+
+    def __init__(self, b, a):
+        self.b = np.asarray(b, dtype=np.float64)
+        self.a = np.asarray(a, dtype=np.float64)
+        # plain floats for step(), padded to one order and scaled to a[0] = 1
+        order = max(len(self.a), len(self.b))
+        self._b = (np.pad(self.b, (0, order - len(self.b))) / self.a[0]).tolist()
+        self._a = (np.pad(self.a, (0, order - len(self.a))) / self.a[0]).tolist()
+        self.reset()
+
+    @classmethod
+    def single_pole(cls, cutoff, sample_rate):
+        return cls(*single_pole_coefficients(cutoff, sample_rate))
+
+    @classmethod
+    def biquad(cls, cutoff, sample_rate, q=1 / math.sqrt(2)):
+        return cls(*biquad_coefficients(cutoff, sample_rate, q))
+
+    def reset(self):
+        self._state = None
+
+    def _settled(self, x):
+        # transposed direct form state after x forever, what lfilter_zi gives
+        y = x * sum(self._b) / sum(self._a)
+        state = [0.0] * (len(self._a) - 1)
+        carry = 0.0
+        for k in reversed(range(len(state))):
+            carry += self._b[k + 1] * x - self._a[k + 1] * y
+            state[k] = carry
+        return state
+
+    def step(self, x):
+        """
+        Filters one sample and returns the output, no numpy or scipy.
+        """
+        b, a = self._b, self._a
+        z = self._state
+        if z is None:
+            z = self._state = self._settled(x)
+        if not z:
+            return b[0] * x
+        y = b[0] * x + z[0]
+        last = len(z) - 1
+        for k in range(last):
+            z[k] = b[k + 1] * x - a[k + 1] * y + z[k + 1]
+        z[last] = b[last + 1] * x - a[last + 1] * y
+        return y
+
+    def process(self, block):
+        from scipy.signal import lfilter
+
+        block = np.asarray(block, dtype=np.float64)
+        if len(block) == 0:
+            return block
+        if self._state is None:
+            self._state = self._settled(float(block[0]))
+        out, state = lfilter(self.b, self.a, block, zi=self._state)
+        self._state = state.tolist()
+        return out
+
+
+def single_pole(samples, cutoff, sample_rate):
+    """
+    One-shot single-pole low-pass of a whole window.
+    """
+    return RecursiveFilter.single_pole(cutoff, sample_rate).process(samples)
+
+
+def biquad_lowpass(samples, cutoff, sample_rate, q=1 / math.sqrt(2)):
+    """
+    One-shot second-order low-pass of a whole window.
+    """
+    return RecursiveFilter.biquad(cutoff, sample_rate, q).process(samples)
@@ -1,21 +1,26 @@
-import busio
-import digitalio
-import board
-import adafruit_mcp3xxx.mcp3008 as MCP
-from adafruit_mcp3xxx.analog_in import AnalogIn
-import time
-import RPi.GPIO as GPIO
+import sys
 import numpy as np
-from scipy import stats
+from acquisition import allowed_step, jitter_stats, open_mcp3008
+from capture import BackgroundCapture
+from classifier import classify
+from decimate import Decimator
+from fingerprint import ChangeDetector
+from frequency import StreamingFrequencyEstimator
+from rate_control import AdaptiveRateController
+from trigger import EdgeTrigger, TriggeredReader
 
-# Create the SPI bus
-spi = busio.SPI(clock=board.SCK, MISO=board.MISO, MOSI=board.MOSI)
-# Create the CS (chip select)
-cs = digitalio.DigitalInOut(board.D5)
-# Create the MCP object
-mcp = MCP.MCP3008(spi, cs)
-# Create an analog input channel on pin 0
-chan = AnalogIn(mcp, MCP.P0)
+# samples come from pin 0 (MCP.P0)
+ADC_PIN = 0
+# windows start on a rising edge through mid-rail
+TRIGGER_LEVEL = 1.65
+TRIGGER_HYSTERESIS = 0.1
+# oversample up to this rate and decimate back down before analysis
+MAX_CAPTURE_RATE = 10000
+MAX_OVERSAMPLE = 8
+
+
+def oversample_factor(sample_rate):
+    return min(max(int(MAX_CAPTURE_RATE // sample_rate), 1), MAX_OVERSAMPLE)
 
 
 def calculate_frequency(samples, sample_rate):
@@ -24,82 +29,89 @@ def calculate_frequency(samples, sample_rate):
     return frequency
 
 
-def moving_average_filter(samples, window_size=5):
-    return np.convolve(samples, np.ones(window_size) / window_size, mode="valid")
-
-
 def detect_waveform_shape(samples, sample_rate):
     # set at slightly above floating voltage
-    print("The max voltage is", np.max(samples))
-    if np.max(samples) < 1.1:
-        print("returning no voltage")
-        return "No Voltage"
-
-    # run a convolution on the raw samples
-    filtered_samples = moving_average_filter(samples)
-    # normalize samples to be between certain ranges
-    normalized_samples = (filtered_samples - np.mean(filtered_samples)) / np.std(
-        filtered_samples
-    )
+    shape, _ = classify(samples, sample_rate, min_voltage=1.1)
+    return shape
 
-    # run some very cool fft magic
-    fft_result = np.fft.fft(normalized_samples)
-    positive_fft_result = np.abs(fft_result[: len(fft_result) // 2]) / len(
-        normalized_samples
-    )
 
-    # find the index at which the fundamental freq is
-    fundamental_freq_index = np.argmax(positive_fft_result[1:]) + 1
-
-    # more magic math
-    crest_factor = np.max(np.abs(normalized_samples)) / np.sqrt(
-        np.mean(normalized_samples**2)
-    )
-    # more magic statistics to measure data dispersion
-    kurtosis = stats.kurtosis(normalized_samples)
-    print(f"Crest Factor: {crest_factor}")
-    print(f"Kurtosis: {kurtosis}")
-    if (
-        np.max(positive_fft_result[fundamental_freq_index::2])
-        > 0.1 * positive_fft_result[fundamental_freq_index]
-        and crest_factor < 1.2
-    ):
-        return "Square Wave"
-    elif crest_factor > 1.3 and crest_factor < 1.5 and kurtosis < -1:
-        return "Sine Wave"
-    else:
-        return "Triangle Wave"
+def main(reader=None):
+    # the ADC on chip select D5 unless another backend is handed in
+    if reader is None:
+        reader = open_mcp3008("D5")
 
-
-def main():
-    sample_rate = 2000  # 2000 Hz
-    duration = 0.5  # 0.5 seconds for faster updates
-    num_samples = int(sample_rate * duration)
+    # starts at 2000 Hz x 0.5 s, then follows the measured frequency
+    controller = AdaptiveRateController(default_rate=2000, default_window=0.5)
+    sample_rate = controller.rate
+    duration = controller.window
+    num_samples = controller.num_samples
 
     last_shape = None
     last_frequency = None
 
-    try:
-        while True:
-            samples = []
-            start_time = time.time()
+    # phase align the windows on a trigger edge, auto mode still shows a
+    # free-running window when nothing crosses the level
+    trigger = EdgeTrigger(TRIGGER_LEVEL, "rising", TRIGGER_HYSTERESIS)
+    source = TriggeredReader(reader, trigger, mode="auto", timeout=2 * duration)
+
+    # capture oversampled, the decimator filters out what would alias
+    decimator = Decimator(oversample_factor(sample_rate))
 
-            for _ in range(num_samples):
-                voltage = chan.voltage
-                samples.append(voltage)
+    # sampling continues on its own thread while a window is analyzed
+    capture = BackgroundCapture(
+        source,
+        num_samples * decimator.factor,
+        ADC_PIN,
+        rate=sample_rate * decimator.factor,
+    )
+    capture.start()
+    last_stamp = None
 
-            actual_sample_rate = num_samples / (time.time() - start_time)
-            samples = np.array(samples)
+    # the classifier only runs again when the window looks different
+    detector = ChangeDetector()
+    shape = confidence = None
 
-            shape = detect_waveform_shape(samples, actual_sample_rate)
+    # crossing times carry over between windows with no cycles lost between
+    estimator = StreamingFrequencyEstimator(span=2 * duration)
+
+    try:
+        while True:
+            # resampled onto an even grid from the per-sample timestamps
+            samples, capture_rate = capture.get(uniform=True)
+            if capture_rate is None:
+                # cut down to a sample or two at a hole, nothing to show
+                continue
+
+            # filter state only carries over when this window picks up right
+            # where the last one stopped, a window cut at a hole does not
+            gap = None if last_stamp is None else capture.timestamps[0] - last_stamp
+            if gap is None or gap > allowed_step(1e9 / capture_rate):
+                decimator.reset()
+            last_stamp = capture.timestamps[-1]
+            samples = decimator.process(samples)
+            actual_sample_rate = capture_rate / decimator.factor
+
+            if detector.changed(samples):
+                shape, confidence = classify(
+                    samples, actual_sample_rate, min_voltage=1.1
+                )
             if shape == "No Voltage":
                 print("No Voltage detected")
                 print("---")
                 last_shape = shape
                 last_frequency = None
+                frequency = None
 
             else:
-                frequency = calculate_frequency(samples, actual_sample_rate)
+                # times of the decimated samples on the capture clock, so
+                # the estimator sees any gap between windows
+                stamps = capture.timestamps[0] + np.arange(len(samples)) * (
+                    1e9 / actual_sample_rate
+                )
+                frequency = estimator.update(samples, stamps)
+                if frequency is None:
+                    # fewer than two rising edges, count crossings instead
+                    frequency = calculate_frequency(samples, actual_sample_rate)
 
                 # check for if changes are made that differ greatly
                 if (
@@ -107,20 +119,54 @@ def main():
                     or (last_frequency is None)
                     or (abs(frequency - last_frequency) > 1)
                 ):
-                    print(f"Detected Waveform Shape: {shape}")
+                    print(f"Detected Waveform Shape: {shape} ({confidence:.0%} sure)")
                     print(f"Calculated Frequency: {frequency:.2f} Hz")
                     print(f"Actual sample rate: {actual_sample_rate:.2f} Hz")
+                    jitter = jitter_stats(capture.timestamps)
+                    print(
+                        f"Sample jitter: p50 {jitter['p50_us']:.1f} us, "
+                        f"p99 {jitter['p99_us']:.1f} us, max {jitter['max_us']:.1f} us"
+                    )
+                    print(f"Jitter histogram: {jitter['histogram'][0].tolist()}")
                     print("---")
 
                     last_shape = shape
                     last_frequency = frequency
-            time.sleep(0.1)  # delay to prevent excess cpu usage
+
+            # retune rate and window to the signal that is actually there
+            if controller.update(frequency):
+                decimator = Decimator(oversample_factor(controller.rate))
+                capture.configure(
+                    controller.num_samples * decimator.factor,
+                    controller.rate * decimator.factor,
+                )
+                source.timeout = 2 * controller.window
+                estimator.span = 2 * controller.window
+                detector.reset()
+                print(controller.describe())
 
     except KeyboardInterrupt:
         print("\nExiting program.")
     finally:
-        GPIO.cleanup()
+        capture.stop()
+        print(detector.describe())
+        if capture.dropped:
+            print(f"Analysis fell behind on {capture.dropped} windows")
+        if capture.split:
+            print(f"Cut {capture.split} windows short at a hole in the sampling")
+        reader.close()
 
 
 if __name__ == "__main__":
-    main()
+    if sys.argv[1:] == ["--ring"]:
+        # share the capture of a running sample_ring.py instead of the ADC
+        from sample_ring import RingBackend
+
+        main(RingBackend())
+    elif len(sys.argv) > 1:
+        # off the Pi: a recording or a generated wave, e.g. "sine 10"
+        from adc_sim import simulated_from_args
+
+        main(simulated_from_args(sys.argv[1:], ADC_PIN))
+    else:
+        main()
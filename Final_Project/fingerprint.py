@@ -0,0 +1,114 @@
+import numpy as np
+from spectrum import plan
+
+# the spectrum is summed into this many equal bands
+COARSE_BANDS = 16
+# band levels are kept in steps of this many dB, down to FLOOR_DB below
+# the strongest band
+COARSE_STEP_DB = 6.0
+FLOOR_DB = -30.0
+# only bands within this of the strongest have to match
+STRONG_DB = -9.0
+
+
+def fingerprint(samples):
+    """
+    Cheap summary of a window: length, RMS about the mean, min, max, the
+    number of mean crossings and a coarse spectrum. The spectrum is the
+    power in COARSE_BANDS equal bands relative to the strongest, in
+    COARSE_STEP_DB steps as a small int8 array; band power barely moves
+    with phase or a little leakage, where single bins would.
+    """
+    samples = np.asarray(samples, dtype=np.float64)
+    n = len(samples)
+    mean = samples.mean()
+    centered = samples - mean
+    rms = np.sqrt(np.dot(centered, centered) / n)
+    # sides of the mean with a dead band of a tenth of the RMS, so noise
+    # around a crossing is not counted as more of them
+    sides = np.sign(centered[np.abs(centered) > 0.1 * rms])
+    crossings = np.count_nonzero(np.diff(sides))
+
+    power = plan(n).magnitude(centered)[1:] ** 2
+    width = max(len(power) // COARSE_BANDS, 1)
+    bands = power[: width * COARSE_BANDS].reshape(-1, width).sum(axis=-1) + 1e-24
+    db = np.maximum(10 * np.log10(bands / bands.max()), FLOOR_DB)
+    spectrum = np.round(db / COARSE_STEP_DB).astype(np.int8)
+    return n, rms, samples.min(), samples.max(), crossings, spectrum
+
+
+def _spread(levels):
+    padded = np.concatenate(([levels[0]], levels, [levels[-1]]))
+    return np.maximum(np.maximum(padded[:-2], padded[1:-1]), padded[2:])
+
+
+class ChangeDetector:
+    """
+    Tells whether a window differs from the one last analyzed, so the scope
+    can keep the previous result instead of classifying the same signal
+    again.
+
+    A window counts as unchanged when its length matches, none of the
+    strong coarse spectrum bands moved by more than one step, its RMS is
+    within rms_tolerance of the reference (relative), its min and max are
+    within level_tolerance of its peak-to-peak swing and its crossing count
+    is within crossing_tolerance of it (relative, at least 2). The
+    reference only moves on a change, so slow drift still adds up to a
+    change in the end. hits and misses count the unchanged and changed
+    windows.
+
+    Only the shape is meant to be reused, a frequency step small enough to
+    stay within the tolerances does not count as a change.
+    """
+
+    def __init__(
+        self, rms_tolerance=0.05, level_tolerance=0.08, crossing_tolerance=0.1
+    ):
+        self.rms_tolerance = rms_tolerance
+        self.level_tolerance = level_tolerance
+        self.crossing_tolerance = crossing_tolerance
+        self.hits = 0
+        self.misses = 0
+        self.reset()
+
+    def reset(self):
+        # the next window is analyzed whatever it looks like
+        self.reference = None
+
+    def similar(self, a, b):
+        n, rms, low, high, crossings, spectrum = a
+        n_b, rms_b, low_b, high_b, crossings_b, spectrum_b = b
+        swing = self.level_tolerance * (high_b - low_b)
+        return (
+            n == n_b
+            and self._same_spectrum(spectrum, spectrum_b)
+            and abs(rms - rms_b) <= self.rms_tolerance * max(rms_b, 1e-9)
+            and abs(low - low_b) <= swing
+            and abs(high - high_b) <= swing
+            and abs(crossings - crossings_b)
+            <= max(2, self.crossing_tolerance * crossings_b)
+        )
+
+    def _same_spectrum(self, a, b):
+        # a harmonic near a band edge can hop to the next band, so each
+        # band is compared as the loudest of it and its neighbours
+        a = _spread(a)
+        b = _spread(b)
+        # weak bands come and go with noise, only the strong ones have to
+        # agree to a step
+        strong = np.maximum(a, b) >= STRONG_DB / COARSE_STEP_DB
+        return np.all(np.abs(a[strong] - b[strong]) <= 1)
+
+    def changed(self, samples):
+        current = fingerprint(samples)
+        if self.reference is not None and self.similar(current, self.reference):
+            self.hits += 1
+            return False
+        self.reference = current
+        self.misses += 1
+        return True
+
+    def describe(self):
+        total = self.hits + self.misses
+        rate = self.hits / total if total else 0.0
+        return f"Analysis cache: {self.hits} hits, {self.misses} misses ({rate:.0%} reused)"
@@ -0,0 +1,168 @@
+import sys
+import numpy as np
+from acquisition import open_mcp3008
+from trigger import EdgeTrigger
+
+
+class StreamingFrequencyEstimator:
+    """
+    Frequency of a running signal from its rising crossings, fed one block
+    at a time.
+
+    Crossings go through an EdgeTrigger so noise on a slow edge is counted
+    once, and each is timed to a fraction of a sample by interpolating
+    between the two samples either side of the level. The trigger state,
+    the last sample and the recent crossing times carry over between
+    blocks, so a crossing that straddles two blocks still counts and every
+    update costs O(block). The estimate is the number of whole periods
+    between the first and last crossing of the last span seconds over the
+    time between them, and goes back to None after span seconds without a
+    crossing.
+
+    Without a level the crossing level follows the running mean of the
+    signal. Blocks can come with perf_counter_ns timestamps, otherwise
+    samples are taken to be 1 / sample_rate apart. A crossing inside a
+    short gap between blocks is still found from the samples either side,
+    but a gap of more than max_gap signal periods (a few sample periods
+    before there is an estimate) may hide whole cycles, so the count
+    starts over, and a block with such a gap inside it is taken as two.
+    Samples stamped no later than the last one seen are skipped, so
+    overlapping windows are fine.
+    """
+
+    def __init__(
+        self, sample_rate=None, level=None, hysteresis=0.05, span=1.0, max_gap=0.5
+    ):
+        self.sample_rate = sample_rate
+        self.fixed_level = level
+        self.span = span
+        self.max_gap = max_gap
+        self.trigger = EdgeTrigger(level or 0.0, "rising", hysteresis)
+        self.reset()
+
+    def reset(self):
+        self.trigger.reset()
+        self.trigger.level = self.fixed_level or 0.0
+        self.frequency = None
+        self._mean = None
+        self._last_value = None
+        self._last_time = None
+        self._period = None
+        self._crossings = np.empty(0)
+
+    def _times(self, n, stamps):
+        if stamps is not None:
+            times = np.asarray(stamps, dtype=np.float64) * 1e-9
+            if n > 1:
+                # the median, a hole in the block does not stretch it
+                self._period = np.median(np.diff(times))
+            return times
+        if self.sample_rate is None:
+            raise ValueError("blocks need timestamps or a sample rate")
+        self._period = 1 / self.sample_rate
+        start = 0.0 if self._last_time is None else self._last_time + self._period
+        return start + np.arange(n) * self._period
+
+    def update(self, block, stamps=None):
+        """
+        Feeds the next block of samples and returns the updated frequency
+        in Hz, or None while there are fewer than two crossings in span.
+        """
+        block = np.asarray(block, dtype=np.float64)
+        if len(block) == 0:
+            return self.frequency
+        times = self._times(len(block), stamps)
+        if self._last_time is not None and times[0] <= self._last_time:
+            # overlaps what came before, e.g. pre-trigger history
+            keep = times > self._last_time
+            block, times = block[keep], times[keep]
+            if len(block) == 0:
+                return self.frequency
+
+        # a hole inside the block is handled like one between blocks
+        cuts = []
+        if len(block) > 1:
+            cuts = np.flatnonzero(np.diff(times) > self._max_gap()) + 1
+        for part, part_times in zip(np.split(block, cuts), np.split(times, cuts)):
+            self._feed(part, part_times)
+        return self.frequency
+
+    def _max_gap(self):
+        if self.frequency:
+            return self.max_gap / self.frequency
+        return 4 * self._period
+
+    def _feed(self, block, times):
+        if self._last_time is not None:
+            if times[0] - self._last_time > self._max_gap():
+                self.trigger.reset()
+                self._last_value = None
+                self._crossings = np.empty(0)
+
+        if self.fixed_level is None:
+            # running mean with a time constant of about span
+            if self._mean is None:
+                self._mean = block.mean()
+            else:
+                weight = 1 - np.exp(-len(block) * self._period / self.span)
+                self._mean += weight * (block.mean() - self._mean)
+            self.trigger.level = self._mean
+
+        edges = self.trigger.find_all(block)
+        if len(edges):
+            # the sample before each edge, from the last block for edge 0
+            if self._last_value is None:
+                edges = edges[edges > 0]
+            values = np.concatenate(([np.nan], block))
+            instants = np.concatenate(([np.nan], times))
+            if self._last_value is not None:
+                values[0] = self._last_value
+                instants[0] = self._last_time
+            before, after = values[edges], values[edges + 1]
+            fraction = (self.trigger.level - before) / (after - before)
+            start = instants[edges]
+            crossed = start + fraction * (instants[edges + 1] - start)
+            self._crossings = np.concatenate((self._crossings, crossed))
+
+        self._last_value = block[-1]
+        self._last_time = times[-1]
+        self._crossings = self._crossings[
+            self._crossings >= self._last_time - self.span
+        ]
+        if len(self._crossings) >= 2:
+            periods = len(self._crossings) - 1
+            self.frequency = periods / (self._crossings[-1] - self._crossings[0])
+        else:
+            self.frequency = None
+
+
+def main(reader=None, pin=0, rate=2000, block=50):
+    """
+    Prints a fresh frequency reading after every block, a block of 50 at
+    2000 Hz being an update every 25 ms.
+    """
+    if reader is None:
+        reader = open_mcp3008("D5")
+    estimator = StreamingFrequencyEstimator()
+    try:
+        while True:
+            samples = reader.read_voltage(block, pin, rate=rate)
+            frequency = estimator.update(samples, reader.timestamps)
+            if frequency is None:
+                print("\rFrequency:    --- Hz", end="", flush=True)
+            else:
+                print(f"\rFrequency: {frequency:8.2f} Hz", end="", flush=True)
+    except KeyboardInterrupt:
+        print("\nExiting program.")
+    finally:
+        reader.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        # off the Pi: a recording or a generated wave, e.g. "sine 10"
+        from adc_sim import simulated_from_args
+
+        main(simulated_from_args(sys.argv[1:]))
+    else:
+        main()
@@ -0,0 +1,75 @@
+import numpy as np
+from spectrum import peak_bin, peak_offset, plan
+
+
+def ideal_thd(shape, num_harmonics=8):
+    """
+    THD over harmonics 2..num_harmonics of an ideal square ("square", odd
+    harmonics at 1/k), triangle ("triangle", odd harmonics at 1/k^2) or
+    sine wave.
+    """
+    power = {"square": 2, "triangle": 4, "sine": None}[shape]
+    if power is None:
+        return 0.0
+    k = np.arange(3, num_harmonics + 1, 2)
+    return float(np.sqrt(np.sum(1.0 / k**power)))
+
+
+def harmonic_features(windows, sample_rate, num_harmonics=8, window="hann"):
+    """
+    Harmonic signature of every row of a (windows, samples) array.
+
+    The fundamental is the strongest peak refined to a fraction of a bin,
+    and harmonic k is read at the bin nearest k times that, taking the
+    largest of it and its two neighbours so a little frequency error does
+    not land between bins; all rows and harmonics in one gather. Harmonics
+    above the Nyquist frequency come back as nan and are left out of:
+
+    thd       RMS of harmonics 2..K over the fundamental
+    odd_even  RMS of odd harmonics 3, 5, ... over that of even ones
+    rolloff   slope of log amplitude against log k over the odd
+              harmonics, -1 for a square wave and -2 for a triangle
+    """
+    windows = np.atleast_2d(np.asarray(windows, dtype=np.float64))
+    n = windows.shape[-1]
+    spectrum_plan = plan(n, window)
+    spectrum = spectrum_plan.transform(windows - windows.mean(axis=-1, keepdims=True))
+    magnitude = np.abs(spectrum) * (2 / spectrum_plan.gain)
+
+    num_bins = spectrum_plan.num_bins
+    peak = peak_bin(magnitude[:, : num_bins - 1])
+    fundamental = peak + peak_offset(spectrum, peak, "jacobsen", window)
+
+    k = np.arange(1, num_harmonics + 1)
+    centers = np.rint(fundamental[:, None] * k).astype(np.intp)
+    valid = centers + 1 < num_bins
+    # the bins either side of each harmonic, clipped inside the spectrum
+    neighbours = np.clip(centers[:, :, None] + np.arange(-1, 2), 0, num_bins - 1)
+    rows = np.arange(len(windows))[:, None, None]
+    amplitudes = magnitude[rows, neighbours].max(axis=-1)
+    # missing harmonics add no power
+    power = np.where(valid, amplitudes * amplitudes, 0.0)
+    amplitudes[~valid] = np.nan
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        thd = np.sqrt(power[:, 1:].sum(axis=-1) / power[:, 0])
+        odd_even = np.sqrt(power[:, 2::2].sum(axis=-1) / power[:, 1::2].sum(axis=-1))
+
+        # least squares slope per row over the odd harmonics that are there
+        x = np.log(k[0::2])
+        y = np.log(amplitudes[:, 0::2])
+        used = np.isfinite(y)
+        count = used.sum(axis=-1)
+        x_mean = np.where(used, x, 0).sum(axis=-1) / count
+        y_mean = np.where(used, y, 0).sum(axis=-1) / count
+        dx = np.where(used, x - x_mean[:, None], 0)
+        dy = np.where(used, y - y_mean[:, None], 0)
+        rolloff = (dx * dy).sum(axis=-1) / (dx * dx).sum(axis=-1)
+
+    return {
+        "fundamental_hz": fundamental * sample_rate / n,
+        "amplitudes": amplitudes,
+        "thd": thd,
+        "odd_even": odd_even,
+        "rolloff": np.where(count >= 2, rolloff, np.nan),
+    }
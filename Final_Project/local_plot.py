@@ -1,20 +1,29 @@
-import csv
+import argparse
 import matplotlib.pyplot as plt
+from plotting import downsample, render
+from recording import load_capture
 
 
-def plot_voltage_from_csv(csv_file):
-    timestamps = []
-    voltages = []
+def plot_voltage_from_csv(csv_file, output=None, start=None, stop=None):
+    # a Timestamp,Voltage CSV or a binary recording, parsed with numpy;
+    # start and stop pick a time range in seconds from the start
+    timestamps, voltages = load_capture(csv_file, start, stop)
 
-    # Read the CSV file
-    with open(csv_file, mode="r") as file:
-        csvreader = csv.reader(file)
-        next(csvreader)  # Skip the header row
-        for row in csvreader:
-            timestamps.append(float(row[0]))  # Convert timestamp to float
-            voltages.append(float(row[1]))  # Convert voltage to float
+    # with an output file the plot is written as a PNG without a display
+    if output is not None:
+        return render(
+            output,
+            timestamps,
+            voltages,
+            title="Voltage Measurement Over Time",
+            xlabel="Time (s)",
+            ylabel="Voltage (V)",
+            label="Voltage over Time",
+            size=(10, 6),
+        )
 
-    # Plotting the data
+    # Plotting the data, two points per pixel column are all that show
+    timestamps, voltages = downsample(timestamps, voltages, 2000)
     plt.figure(figsize=(10, 6))
     plt.plot(timestamps, voltages, label="Voltage over Time", color="b")
     plt.xlabel("Time (s)")
@@ -25,5 +34,20 @@ def plot_voltage_from_csv(csv_file):
     plt.show()
 
 
+def main():
+    parser = argparse.ArgumentParser(description="Plots a recorded capture.")
+    parser.add_argument(
+        "capture",
+        nargs="?",
+        default="microphone_data.csv",
+        help="a Timestamp,Voltage CSV or a binary recording",
+    )
+    parser.add_argument("--output", help="write a PNG here instead of showing it")
+    parser.add_argument("--start", type=float, help="seconds from the start")
+    parser.add_argument("--stop", type=float, help="seconds from the start")
+    args = parser.parse_args()
+    plot_voltage_from_csv(args.capture, args.output, args.start, args.stop)
+
+
 if __name__ == "__main__":
-    plot_voltage_from_csv("microphone_data.csv")
+    main()
@@ -1,47 +1,60 @@
-import busio
-import digitalio
-import board
-import adafruit_mcp3xxx.mcp3008 as MCP
-from adafruit_mcp3xxx.analog_in import AnalogIn
-import time
-import csv
-
-# Create the SPI bus
-spi = busio.SPI(clock=board.SCK, MISO=board.MISO, MOSI=board.MOSI)
-# Create the CS (chip select)
-cs = digitalio.DigitalInOut(board.D4)
-# Create the MCP object
-mcp = MCP.MCP3008(spi, cs)
-# Create an analog input channel on pin 0
-chan = AnalogIn(mcp, MCP.P0)
-
-
-def main():
-    sample_rate = 1000  # Reduced sample rate to 1000 Hz
-    duration = 5  # Record for 5 seconds
+import sys
+import numpy as np
+from acquisition import open_mcp3008
+from recording import RecordingWriter, export_csv
+
+# the microphone sits on pin 0 of the MCP3008 behind chip select D4
+MIC_PIN = 0
+# samples per read, a tenth of a second at the default rate
+BLOCK = 100
+
+
+def main(
+    reader=None,
+    sample_rate=1000,
+    duration=5,
+    output_file="microphone_data.rec",
+    csv_file="microphone_data.csv",
+):
+    """
+    Records duration seconds from the microphone into a binary recording
+    and, unless csv_file is None, exports it as the Timestamp,Voltage CSV
+    that local_plot.py reads once sampling is over.
+    """
+    if reader is None:
+        reader = open_mcp3008("D4")
     num_samples = int(sample_rate * duration)
-    output_file = "microphone_data.csv"  # Output CSV file
+    counts = np.empty(BLOCK, dtype=np.uint16)
+    stamps = np.empty(BLOCK, dtype=np.int64)
 
     try:
-        with open(output_file, mode="w", newline="") as csvfile:
-            csvwriter = csv.writer(csvfile)
-            csvwriter.writerow(["Timestamp", "Voltage"])  # Header for CSV
-
+        with RecordingWriter(
+            output_file, sample_rate, pin=MIC_PIN, vref=reader.vref
+        ) as writer:
             print(f"Recording {duration} seconds of data at {sample_rate} Hz...")
-
-            start_time = time.time()
-
-            for _ in range(num_samples):
-                timestamp = time.time() - start_time
-                voltage = chan.voltage
-                csvwriter.writerow([timestamp, voltage])
-                time.sleep(1 / sample_rate)  # Wait for the next sample
-
-            print(f"Data recording saved to {output_file}")
+            for start in range(0, num_samples, BLOCK):
+                n = min(BLOCK, num_samples - start)
+                reader.read_counts(
+                    n, MIC_PIN, rate=sample_rate, out=counts[:n], stamps=stamps[:n]
+                )
+                writer.write(counts[:n], stamps[:n])
+        print(f"Data recording saved to {output_file}")
+
+        if csv_file is not None:
+            export_csv(output_file, csv_file)
+            print(f"Exported to {csv_file}")
 
     except KeyboardInterrupt:
         print("\nExiting program.")
+    finally:
+        reader.close()
 
 
 if __name__ == "__main__":
-    main()
+    if len(sys.argv) > 1:
+        # off the Pi: a recording or a generated wave, e.g. "sine 10"
+        from adc_sim import simulated_from_args
+
+        main(simulated_from_args(sys.argv[1:], pin=MIC_PIN))
+    else:
+        main()
@@ -0,0 +1,182 @@
+import os
+import sys
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from acquisition import open_mcp3008
+from classifier import NUM_HARMONICS, classify_batch
+from harmonics import harmonic_features
+from moments import moments
+
+# jobs with fewer samples than this run in the calling process, starting
+# the shards costs more than the analysis of a few windows
+MIN_PARALLEL_SAMPLES = 1 << 16
+
+# the block a worker last attached to, kept open between jobs
+_attached = {}
+
+
+def analyze_windows(windows, sample_rate, min_voltage=1.1):
+    """
+    What the scope shows for every row of a (windows, samples) array: the
+    shape label and its confidence, the fundamental in Hz, THD, mean and
+    RMS about the mean. Each entry is an array with one value per row.
+    """
+    windows = np.atleast_2d(np.asarray(windows, dtype=np.float64))
+    features = harmonic_features(windows, sample_rate, NUM_HARMONICS)
+    labels, confidence = classify_batch(windows, sample_rate, min_voltage, features)
+    stats = moments(windows)
+    return {
+        "label": labels,
+        "confidence": confidence,
+        "frequency": features["fundamental_hz"],
+        "thd": features["thd"],
+        "mean": stats["mean"],
+        "rms": stats["std"],
+    }
+
+
+def _shard(name, shape, dtype, start, stop, func, args):
+    # runs in a worker, the windows are read straight out of the block
+    shm = _attached.get(name)
+    if shm is None:
+        for old in _attached.values():
+            old.close()
+        _attached.clear()
+        # pool workers share the parent's resource tracker, so attaching
+        # here does not hand the block to anyone else to unlink
+        shm = _attached[name] = shared_memory.SharedMemory(name=name)
+    windows = np.ndarray(shape, dtype=dtype, buffer=shm.buf)[start:stop]
+    return func(windows, *args)
+
+
+def _join(parts):
+    # puts the shard results back together in row order
+    first = parts[0]
+    if isinstance(first, dict):
+        return {key: _join([part[key] for part in parts]) for key in first}
+    if isinstance(first, tuple):
+        return tuple(_join(list(column)) for column in zip(*parts))
+    if isinstance(first, np.ndarray):
+        return np.concatenate(parts)
+    return [item for part in parts for item in part]
+
+
+class ParallelAnalyzer:
+    """
+    Spreads the analysis of a (channels or windows, samples) array over a
+    pool of worker processes.
+
+    The array is copied once into a shared memory block and every worker
+    gets a contiguous run of rows by block name and offsets, so only the
+    per-row results travel back through pickling. The block and the pool
+    are kept for the next job, the block grows when a bigger one comes.
+
+    func takes the rows and the extra arguments given to map() and returns
+    an array, a list, a tuple of them or a dict of them with one entry per
+    row, like analyze_windows or classify_batch. It has to be a module
+    level function so the workers can find it. Results come back in row
+    order whichever shard finishes first. Jobs under min_parallel samples,
+    or with a single worker, run in the calling process.
+    """
+
+    def __init__(
+        self, max_workers=None, min_parallel=MIN_PARALLEL_SAMPLES, mp_context=None
+    ):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.min_parallel = min_parallel
+        self.mp_context = mp_context
+        self._pool = None
+        self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _share(self, windows):
+        if self._shm is None or self._shm.size < windows.nbytes:
+            self._release()
+            # room to grow, so a slightly longer capture does not mean
+            # a new block
+            size = 1 << max(int(windows.nbytes - 1).bit_length(), 12)
+            self._shm = shared_memory.SharedMemory(create=True, size=size)
+        np.ndarray(windows.shape, dtype=windows.dtype, buffer=self._shm.buf)[:] = (
+            windows
+        )
+        return self._shm.name
+
+    def _release(self):
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def map(self, func, windows, *args):
+        windows = np.ascontiguousarray(np.atleast_2d(windows))
+        workers = min(self.max_workers, len(windows))
+        if workers < 2 or windows.size < self.min_parallel:
+            return func(windows, *args)
+
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.max_workers, self.mp_context)
+        name = self._share(windows)
+        bounds = np.linspace(0, len(windows), workers + 1).astype(int)
+        futures = [
+            self._pool.submit(
+                _shard, name, windows.shape, windows.dtype.str, start, stop, func, args
+            )
+            for start, stop in zip(bounds[:-1], bounds[1:])
+        ]
+        return _join([future.result() for future in futures])
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        self._release()
+
+
+def main(reader=None, channels=(0, 1, 2, 3), rate=2000, num_samples=2000):
+    """
+    Scans several inputs at once and prints the analysis of each channel,
+    one line per channel, after every scan.
+    """
+    if reader is None:
+        reader = open_mcp3008("D5")
+    analyzer = ParallelAnalyzer()
+    try:
+        while True:
+            volts = reader.read_scan_voltage(channels, num_samples, rate=rate)
+            result = analyzer.map(analyze_windows, volts, reader.sample_rate)
+            for i, channel in enumerate(channels):
+                print(
+                    f"CH{channel}: {result['label'][i]:<30} "
+                    f"({result['confidence'][i]:.0%}) "
+                    f"{result['frequency'][i]:8.2f} Hz "
+                    f"mean {result['mean'][i]:.2f} V rms {result['rms'][i]:.2f} V"
+                )
+            print()
+    except KeyboardInterrupt:
+        print("Exiting program.")
+    finally:
+        analyzer.close()
+        reader.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "sim":
+        # off the Pi: one generated wave per channel
+        from adc_sim import SignalSource, SimulatedMCP3008, load_generators
+
+        generators = load_generators()
+        sources = {
+            0: SignalSource.from_generator(generators["sine"], 10),
+            1: SignalSource.from_generator(generators["square"], 25),
+            2: SignalSource.from_generator(generators["triangle"], 40),
+            3: SignalSource.from_generator(generators["sine"], 55),
+        }
+        main(SimulatedMCP3008(sources, noise=0.005))
+    else:
+        main()
@@ -0,0 +1,139 @@
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+METHODS = ("minmax", "lttb")
+
+
+def minmax_envelope(t, y, num_points):
+    """
+    Splits the trace into num_points / 2 equal buckets and keeps the lowest
+    and highest sample of each, in time order. Drawn as a line that is the
+    same picture as the full trace once a bucket is no wider than a pixel
+    column, spikes included.
+    """
+    n = len(y)
+    if n <= num_points:
+        return t, y
+    size = -(-n // max(num_points // 2, 1))
+    buckets = -(-n // size)
+    # the last bucket is padded with the final sample, which can only ever
+    # pick that sample again
+    padded = np.concatenate((y, np.full(buckets * size - n, y[-1])))
+    padded = padded.reshape(buckets, size)
+    start = np.arange(buckets) * size
+    low = np.minimum(start + padded.argmin(axis=-1), n - 1)
+    high = np.minimum(start + padded.argmax(axis=-1), n - 1)
+    keep = np.stack((np.minimum(low, high), np.maximum(low, high)), axis=-1).ravel()
+    return t[keep], y[keep]
+
+
+def lttb(t, y, num_points):
+    """
+    Largest-Triangle-Three-Buckets: keeps the first and last sample and from
+    each bucket in between the one that makes the largest triangle with the
+    point kept before it and the average of the next bucket. Follows the
+    shape of the trace more smoothly than the envelope at the same count,
+    but a lone spike can be dropped.
+    """
+    n = len(y)
+    if n <= num_points or num_points < 3:
+        return t, y
+    edges = np.linspace(1, n - 1, num_points - 1).astype(np.intp)
+    counts = np.diff(edges)
+    # the average of the bucket after each one, the last bucket looks at
+    # the final sample
+    t_next = np.add.reduceat(t[:-1], edges[:-1])[1:] / counts[1:]
+    y_next = np.add.reduceat(y[:-1], edges[:-1])[1:] / counts[1:]
+    t_next = np.append(t_next, t[-1])
+    y_next = np.append(y_next, y[-1])
+
+    keep = np.empty(num_points, dtype=np.intp)
+    keep[0] = 0
+    keep[-1] = n - 1
+    previous = 0
+    for i in range(num_points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        area = np.abs(
+            (t[previous] - t_next[i]) * (y[lo:hi] - y[previous])
+            - (t[previous] - t[lo:hi]) * (y_next[i] - y[previous])
+        )
+        previous = lo + int(area.argmax())
+        keep[i + 1] = previous
+    return t[keep], y[keep]
+
+
+def downsample(t, y, num_points=2000, method="minmax"):
+    """
+    Reduces a trace to about num_points points for drawing.
+    """
+    if method not in METHODS:
+        raise ValueError(f"unknown method {method}")
+    t = np.asarray(t, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if method == "minmax":
+        return minmax_envelope(t, y, num_points)
+    return lttb(t, y, num_points)
+
+
+def render(
+    path,
+    t,
+    y,
+    title="",
+    xlabel="Time [s]",
+    ylabel="Amplitude",
+    label=None,
+    method="minmax",
+    size=(8, 4),
+    dpi=100,
+):
+    """
+    Draws one trace to a PNG without a display. The figure is built with
+    the Agg canvas directly instead of pyplot, so nothing is kept around
+    between figures and it is safe to call from worker processes. The trace
+    is cut down to two points per pixel column first.
+    """
+    t, y = downsample(t, y, 2 * int(size[0] * dpi), method)
+    figure = Figure(figsize=size, dpi=dpi)
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot()
+    axes.plot(t, y, label=label, color="b")
+    axes.set_title(title)
+    axes.set_xlabel(xlabel)
+    axes.set_ylabel(ylabel)
+    axes.grid(True)
+    if label:
+        axes.legend()
+    figure.tight_layout()
+    figure.savefig(path)
+    return path
+
+
+def _render_job(job):
+    return render(**job)
+
+
+def render_batch(jobs, max_workers=None, method="minmax"):
+    """
+    Renders many figures at once. jobs is a list of render() keyword
+    arguments, each with at least path, t and y. The traces are cut down
+    here before they go to the workers, so only a few thousand points per
+    figure are pickled, and the figures are drawn in parallel. Returns the
+    paths in the order of jobs.
+    """
+    small = []
+    for job in jobs:
+        job = {"method": method, **job}
+        size = job.get("size", (8, 4))
+        points = 2 * int(size[0] * job.get("dpi", 100))
+        job["t"], job["y"] = downsample(job["t"], job["y"], points, job["method"])
+        small.append(job)
+
+    workers = min(max_workers or os.cpu_count() or 1, len(small))
+    if workers < 2:
+        return [_render_job(job) for job in small]
+    with ProcessPoolExecutor(workers) as pool:
+        return list(pool.map(_render_job, small))
@@ -0,0 +1,97 @@
+import math
+
+
+def nice_rate(rate):
+    """
+    Rounds a rate up to the next 1-2-5 step so small changes in the
+    estimate do not retune the capture every window.
+    """
+    decade = 10 ** math.floor(math.log10(rate))
+    for step in (1, 2, 5, 10):
+        if rate <= step * decade:
+            return step * decade
+
+
+class AdaptiveRateController:
+    """
+    Picks the sample rate and window length of the next capture from the
+    last fundamental estimate.
+
+    The rate aims for samples_per_cycle samples per period, enough for the
+    first few harmonics the classifier looks at, and stays within what the
+    bus can do. The window covers at least min_cycles periods and is long
+    enough that the zero-crossing count resolves the frequency to
+    tolerance Hz. An estimate close to the current Nyquist limit can be an
+    alias, so the rate jumps to max_rate to measure again. Without a
+    signal the defaults come back.
+    """
+
+    def __init__(
+        self,
+        default_rate=2000,
+        default_window=0.5,
+        min_rate=200,
+        max_rate=10000,
+        samples_per_cycle=20,
+        min_cycles=4,
+        tolerance=1.0,
+        max_window=2.0,
+    ):
+        self.default_rate = default_rate
+        self.default_window = default_window
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.samples_per_cycle = samples_per_cycle
+        self.min_cycles = min_cycles
+        self.tolerance = tolerance
+        self.max_window = max_window
+        self.rate = default_rate
+        self.window = default_window
+        # why the current setting was picked
+        self.reason = "default"
+        # whether the rate came from a frequency estimate
+        self.tracking = False
+
+    @property
+    def num_samples(self):
+        return int(self.rate * self.window)
+
+    def update(self, frequency):
+        """
+        Feeds in the latest frequency estimate, None when there was no
+        signal. Returns True when the rate or window changed.
+        """
+        tracking = False
+        if frequency is None or frequency <= 0:
+            rate, window, reason = self.default_rate, self.default_window, "no signal"
+        elif frequency > self.rate / 4:
+            # too few samples per period to trust it, could be an alias
+            rate = self.max_rate
+            window = self.default_window
+            reason = f"{frequency:.1f} Hz near Nyquist, rechecking at full rate"
+        else:
+            target = self.samples_per_cycle * frequency
+            rate = min(max(nice_rate(target), self.min_rate), self.max_rate)
+            # an estimate sitting on a step boundary would flip between two
+            # rates every window, keep the current one while it still fits
+            if self.tracking and target * 0.8 <= self.rate <= target * 4:
+                rate = self.rate
+            # a zero-crossing count is good to half a cycle per window
+            window = max(self.min_cycles / frequency, 1 / (2 * self.tolerance))
+            # quarter second steps keep the window from following every
+            # wobble of the estimate
+            window = min(math.ceil(window * 4) / 4, self.max_window)
+            reason = f"{frequency:.1f} Hz, {rate / frequency:.0f} samples per cycle"
+            tracking = True
+
+        self.tracking = tracking
+        changed = rate != self.rate or window != self.window
+        if changed:
+            self.rate, self.window, self.reason = rate, window, reason
+        return changed
+
+    def describe(self):
+        return (
+            f"Capture set to {self.rate} Hz x {self.window:.2f} s "
+            f"({self.num_samples} samples): {self.reason}"
+        )
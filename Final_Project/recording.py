@@ -0,0 +1,433 @@
+import io
+import queue
+import struct
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+import numpy as np
+from acquisition import VREF, counts_to_volts
+
+MAGIC = b"SCOPEREC"
+VERSION = 1
+# magic, version, pin, chunk size, nominal sample rate, vref, time.time()
+# at the start and the perf_counter_ns the timestamps are relative to
+HEADER = struct.Struct("<8sHHIdddq")
+HEADER_SIZE = 64
+CHUNK_SIZE = 4096
+
+
+def chunk_dtype(chunk_size):
+    """
+    Layout of one chunk on disk: the number of samples in use, then the
+    timestamps in ns since the start of the recording and the 10-bit codes.
+    Every chunk has the same size, the last one is padded, so a whole file
+    reads as one array of these.
+    """
+    return np.dtype(
+        [
+            ("count", "<u4"),
+            ("reserved", "<u4"),
+            ("stamps", "<i8", (chunk_size,)),
+            ("counts", "<u2", (chunk_size,)),
+        ]
+    )
+
+
+def read_header(f):
+    raw = f.read(HEADER_SIZE)
+    if len(raw) < HEADER_SIZE or raw[:8] != MAGIC:
+        raise ValueError("not a scope recording")
+    magic, version, pin, chunk_size, sample_rate, vref, start_time, start_ns = (
+        HEADER.unpack(raw[: HEADER.size])
+    )
+    if version != VERSION:
+        raise ValueError(f"unsupported recording version {version}")
+    return {
+        "pin": pin,
+        "chunk_size": chunk_size,
+        "sample_rate": sample_rate,
+        "vref": vref,
+        "start_time": start_time,
+        "start_ns": start_ns,
+    }
+
+
+class RecordingWriter:
+    """
+    Streams ADC codes and their timestamps to a binary recording.
+
+    write() only copies a block into the chunk being filled, a full chunk
+    goes to a background thread that does the file writes, so the sampling
+    loop never waits on the disk or formats a number. Written chunks come
+    back to be filled again. An error on the writer thread is raised by
+    the next write() or by close().
+    """
+
+    def __init__(
+        self,
+        path,
+        sample_rate,
+        pin=0,
+        vref=VREF,
+        chunk_size=CHUNK_SIZE,
+        start_time=None,
+        start_ns=None,
+    ):
+        self.path = path
+        self.chunk_size = chunk_size
+        # an earlier capture being copied keeps its own start
+        self.start_time = time.time() if start_time is None else start_time
+        self.start_ns = time.perf_counter_ns() if start_ns is None else start_ns
+        self.samples = 0
+        self._dtype = chunk_dtype(chunk_size)
+        header = self._header(pin, sample_rate or 0.0, vref)
+        self._file = open(path, "wb")
+        self._file.write(header.ljust(HEADER_SIZE, b"\0"))
+        self._full = queue.Queue()
+        self._free = queue.Queue()
+        self._chunk = self._new_chunk()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _new_chunk(self):
+        try:
+            chunk = self._free.get_nowait()
+        except queue.Empty:
+            chunk = np.zeros(1, dtype=self._dtype)
+        chunk["count"] = 0
+        return chunk
+
+    def _header(self, pin, sample_rate, vref):
+        return HEADER.pack(
+            MAGIC,
+            VERSION,
+            pin,
+            self.chunk_size,
+            sample_rate,
+            vref,
+            self.start_time,
+            self.start_ns,
+        )
+
+    def _store(self, chunk):
+        # on the writer thread, other formats encode the chunk here
+        chunk.tofile(self._file)
+
+    def _finish(self):
+        # on close, after the last chunk is stored
+        pass
+
+    def _run(self):
+        try:
+            while True:
+                chunk = self._full.get()
+                if chunk is None:
+                    break
+                self._store(chunk)
+                self._free.put(chunk)
+        except Exception as e:
+            self._error = e
+
+    def write(self, counts, stamps):
+        """
+        Appends a block of codes and their perf_counter_ns times.
+        """
+        if self._error is not None:
+            raise self._error
+        done = 0
+        while done < len(counts):
+            chunk = self._chunk
+            filled = int(chunk["count"][0])
+            n = min(len(counts) - done, self.chunk_size - filled)
+            chunk["counts"][0, filled : filled + n] = counts[done : done + n]
+            np.subtract(
+                stamps[done : done + n],
+                self.start_ns,
+                out=chunk["stamps"][0, filled : filled + n],
+            )
+            chunk["count"] = filled + n
+            done += n
+            if filled + n == self.chunk_size:
+                self._full.put(chunk)
+                self._chunk = self._new_chunk()
+        self.samples += len(counts)
+
+    def close(self):
+        if self._file is None:
+            return
+        if self._chunk["count"][0]:
+            # the unused end of the last chunk is left as zeros
+            self._chunk["counts"][0, self._chunk["count"][0] :] = 0
+            self._chunk["stamps"][0, self._chunk["count"][0] :] = 0
+            self._full.put(self._chunk)
+        self._full.put(None)
+        self._thread.join()
+        if self._error is None:
+            self._finish()
+        self._file.close()
+        self._file = None
+        if self._error is not None:
+            raise self._error
+
+
+class ChunkedCapture(ABC):
+    """
+    Random access to a capture kept in chunks of consecutive samples.
+
+    read() slices by sample index and time_slice() by seconds from the
+    start, both return (counts, stamps) with stamps in ns since the start,
+    and only the chunks a range touches are read. counts and stamps load
+    the whole capture. A format sets _offsets, the sample index every
+    chunk starts at followed by the total, and _first, the first stamp of
+    every chunk, and gives the used part of a chunk from _chunk(). A
+    capture holds on to its file until close(), or the end of a with
+    block.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        pass
+
+    @abstractmethod
+    def _chunk(self, index):
+        """
+        (counts, stamps) of chunk index, stamps in ns since the start.
+        """
+
+    @abstractmethod
+    def to_volts(self, counts):
+        """
+        Converts counts of this capture to volts with its reference.
+        """
+
+    def __len__(self):
+        return int(self._offsets[-1])
+
+    @property
+    def duration(self):
+        """
+        Seconds from the start of the capture to its last sample.
+        """
+        if not len(self):
+            return 0.0
+        return self.read(len(self) - 1, len(self))[1][0] / 1e9
+
+    def read(self, start=0, stop=None):
+        """
+        Samples start to stop, copied out of the chunks they sit in.
+        """
+        length = len(self)
+        stop = length if stop is None else min(stop, length)
+        start = max(min(start, stop), 0)
+        counts = np.empty(stop - start, dtype=np.uint16)
+        stamps = np.empty(stop - start, dtype=np.int64)
+        first = np.searchsorted(self._offsets, start, side="right") - 1
+        last = np.searchsorted(self._offsets, stop, side="left")
+        for chunk in range(first, last):
+            base = self._offsets[chunk]
+            lo = max(start, base) - base
+            hi = min(stop, self._offsets[chunk + 1]) - base
+            out = slice(base + lo - start, base + hi - start)
+            chunk_counts, chunk_stamps = self._chunk(chunk)
+            counts[out] = chunk_counts[lo:hi]
+            stamps[out] = chunk_stamps[lo:hi]
+        return counts, stamps
+
+    def index_at(self, seconds):
+        """
+        Index of the first sample stamped at or after seconds.
+        """
+        ns = int(round(seconds * 1e9))
+        chunk = np.searchsorted(self._first[: len(self._offsets) - 1], ns, "right")
+        if chunk == 0:
+            return 0
+        chunk -= 1
+        inside = np.searchsorted(self._chunk(chunk)[1], ns, "left")
+        return int(self._offsets[chunk] + inside)
+
+    def time_slice(self, start=None, stop=None):
+        """
+        Samples from start up to but not including stop, in seconds from
+        the start of the capture; None leaves that end open.
+        """
+        first = 0 if start is None else self.index_at(start)
+        last = len(self) if stop is None else self.index_at(stop)
+        return self.read(first, last)
+
+    @property
+    def counts(self):
+        return self.read()[0]
+
+    @property
+    def stamps(self):
+        return self.read()[1]
+
+    @property
+    def times(self):
+        return self.stamps / 1e9
+
+    @property
+    def voltages(self):
+        return self.to_volts(self.counts)
+
+
+class Recording(ChunkedCapture):
+    """
+    A recording opened as a read-only memory map, with the header fields
+    as attributes. Only the pages of the chunks a read touches come off
+    the disk, so a time range out of a long capture costs about the size
+    of the range.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.__dict__.update(read_header(f))
+            f.seek(0, 2)
+            size = f.tell()
+        dtype = chunk_dtype(self.chunk_size)
+        num_chunks = (size - HEADER_SIZE) // dtype.itemsize
+        if num_chunks:
+            self._chunks = np.memmap(
+                path, dtype=dtype, mode="r", offset=HEADER_SIZE, shape=num_chunks
+            )
+        else:
+            self._chunks = np.zeros(0, dtype=dtype)
+        self._used = self._chunks["count"].astype(np.int64)
+        self._offsets = np.concatenate(([0], np.cumsum(self._used)))
+        self._first = self._chunks["stamps"][:, 0].copy()
+
+    def _chunk(self, index):
+        used = self._used[index]
+        return (
+            self._chunks["counts"][index, :used],
+            self._chunks["stamps"][index, :used],
+        )
+
+    def close(self):
+        # reads copy out of the map, so nothing else holds on to it
+        self._chunks = np.zeros(0, dtype=self._chunks.dtype)
+
+    def to_volts(self, counts):
+        return counts_to_volts(counts, self.vref)
+
+
+def open_capture(path):
+    """
+    Opens a binary recording or a compressed archive for random access,
+    None for anything else such as a CSV.
+    """
+    with open(path, "rb") as f:
+        magic = f.read(len(MAGIC))
+    if magic == MAGIC:
+        return Recording(path)
+    from archive import ARCHIVE_MAGIC, Archive
+
+    if magic == ARCHIVE_MAGIC:
+        return Archive(path)
+    return None
+
+
+def read_csv(path, block_size=1 << 20):
+    """
+    Loads a Timestamp,Voltage CSV into two float arrays. The file is parsed
+    block by block with numpy instead of row by row into lists, which is
+    several times faster and never holds more than one block of text.
+    """
+    parts = []
+    rest = b""
+    with open(path, "rb") as f:
+        f.readline()  # the header row
+        while True:
+            text = f.read(block_size)
+            if not text:
+                break
+            # a block ends on the last full line, the rest goes with the next
+            text = rest + text
+            cut = text.rfind(b"\n") + 1
+            rest = text[cut:]
+            if cut:
+                parts.append(np.loadtxt(io.BytesIO(text[:cut]), delimiter=",", ndmin=2))
+    if rest.strip():
+        parts.append(np.loadtxt(io.BytesIO(rest), delimiter=",", ndmin=2))
+    data = np.concatenate(parts) if parts else np.empty((0, 2))
+    return data[:, 0], data[:, 1]
+
+
+def load_capture(path, start=None, stop=None):
+    """
+    Timestamps in seconds and voltages of a capture, a binary recording,
+    an archive or a legacy CSV, optionally limited to start <= t < stop
+    seconds. Only the binary formats can skip the samples outside the range
+    without reading them.
+    """
+    capture = open_capture(path)
+    if capture is not None:
+        with capture:
+            counts, stamps = capture.time_slice(start, stop)
+            return stamps / 1e9, capture.to_volts(counts)
+    times, voltages = read_csv(path)
+    keep = np.ones(len(times), dtype=bool)
+    if start is not None:
+        keep &= times >= start
+    if stop is not None:
+        keep &= times < stop
+    if keep.all():
+        return times, voltages
+    return times[keep], voltages[keep]
+
+
+def export_csv(path, csv_path, block=1 << 16):
+    """
+    Writes a recording or an archive as the Timestamp,Voltage CSV that
+    mic_detect.py used to produce, with timestamps in seconds from the
+    start.
+    """
+    capture = open_capture(path)
+    if capture is None:
+        raise ValueError(f"{path} is not a binary capture")
+    with capture, open(csv_path, "w", newline="") as f:
+        f.write("Timestamp,Voltage\n")
+        for i in range(0, len(capture), block):
+            counts, stamps = capture.read(i, i + block)
+            rows = np.column_stack((stamps / 1e9, capture.to_volts(counts)))
+            np.savetxt(f, rows, fmt="%.9g", delimiter=",")
+    return len(capture)
+
+
+def main(args):
+    """
+    python recording.py info capture.rec
+    python recording.py export capture.rec|capture.sca capture.csv
+    """
+    if len(args) == 2 and args[0] == "info":
+        with Recording(args[1]) as recording:
+            print(
+                f"{args[1]}: {len(recording)} samples of pin {recording.pin} "
+                f"over {recording.duration:.3f} s at {recording.sample_rate:g} Hz "
+                f"nominal, vref {recording.vref} V, started "
+                f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(recording.start_time))}"
+            )
+    elif len(args) == 3 and args[0] == "export":
+        count = export_csv(args[1], args[2])
+        print(f"Exported {count} samples to {args[2]}")
+    else:
+        print(main.__doc__)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
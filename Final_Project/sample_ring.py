@@ -0,0 +1,255 @@
+import sys
+import time
+import numpy as np
+from multiprocessing import resource_tracker, shared_memory
+from acquisition import ADCBackend, VREF, open_mcp3008
+
+DEFAULT_NAME = "scope_ring"
+# capacity, samples written, pin, then sample rate and vref as floats and
+# the samples written once the block being copied in has landed
+HEADER_SIZE = 64
+
+
+class SampleRing:
+    """
+    Ring of ADC codes and timestamps in shared memory.
+
+    One acquisition process creates the ring and writes into it, any number
+    of other processes attach by name and read through a RingCursor. The
+    header holds the total number of samples ever written, which serves as
+    the sequence number: a reader compares it with its own position to see
+    what is new and whether the writer has lapped it. Like a seqlock the
+    writer also moves a second counter, claimed, before it copies a block
+    in, so a reader can tell a copy it made while the writer was already
+    overwriting those slots. The arrays are numpy views straight onto the
+    shared block, nothing is copied on the way.
+    """
+
+    def __init__(self, shm, owner):
+        self._shm = shm
+        self.owner = owner
+        self.name = shm.name
+        self._ints = np.ndarray(3, dtype=np.int64, buffer=shm.buf)
+        self._floats = np.ndarray(2, dtype=np.float64, buffer=shm.buf, offset=24)
+        self._claimed = np.ndarray(1, dtype=np.int64, buffer=shm.buf, offset=40)
+        self.capacity = int(self._ints[0])
+        self.stamps = np.ndarray(
+            self.capacity, dtype=np.int64, buffer=shm.buf, offset=HEADER_SIZE
+        )
+        self.counts = np.ndarray(
+            self.capacity,
+            dtype=np.uint16,
+            buffer=shm.buf,
+            offset=HEADER_SIZE + 8 * self.capacity,
+        )
+
+    @classmethod
+    def create(cls, capacity, name=DEFAULT_NAME, pin=0, vref=VREF):
+        shm = shared_memory.SharedMemory(
+            name=name, create=True, size=HEADER_SIZE + 10 * capacity
+        )
+        np.ndarray(3, dtype=np.int64, buffer=shm.buf)[:] = (capacity, 0, pin)
+        np.ndarray(2, dtype=np.float64, buffer=shm.buf, offset=24)[:] = (0.0, vref)
+        np.ndarray(1, dtype=np.int64, buffer=shm.buf, offset=40)[0] = 0
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name=DEFAULT_NAME):
+        try:
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            shm = shared_memory.SharedMemory(name=name)
+            # before Python 3.13 attaching registers the block with the
+            # resource tracker, which would unlink it when this reader exits
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return cls(shm, owner=False)
+
+    @property
+    def written(self):
+        return int(self._ints[1])
+
+    @property
+    def claimed(self):
+        return int(self._claimed[0])
+
+    @property
+    def pin(self):
+        return int(self._ints[2])
+
+    @property
+    def sample_rate(self):
+        return float(self._floats[0]) or None
+
+    @property
+    def vref(self):
+        return float(self._floats[1])
+
+    def write(self, counts, stamps, sample_rate=None):
+        """
+        Appends a block. claimed moves before the data goes in and the
+        sequence number after, so readers never see samples that are not
+        there yet and can check that the ones they copied were not being
+        overwritten meanwhile.
+        """
+        counts = counts[-self.capacity :]
+        stamps = stamps[-self.capacity :]
+        written = self.written
+        self._claimed[0] = written + len(counts)
+        start = written % self.capacity
+        first = min(len(counts), self.capacity - start)
+        self.counts[start : start + first] = counts[:first]
+        self.stamps[start : start + first] = stamps[:first]
+        rest = len(counts) - first
+        self.counts[:rest] = counts[first:]
+        self.stamps[:rest] = stamps[first:]
+        if sample_rate:
+            self._floats[0] = sample_rate
+        self._ints[1] = written + len(counts)
+
+    def close(self):
+        # the views have to go before the mapping can be closed
+        self._ints = self._floats = self._claimed = None
+        self.counts = self.stamps = None
+        self._shm.close()
+        if self.owner:
+            self._shm.unlink()
+
+
+class RingCursor:
+    """
+    One reader's position in a SampleRing.
+
+    read() hands out views of the ring itself. If the reader falls more
+    than a ring behind, the samples it missed are counted in lost, overruns
+    goes up and reading resumes at the oldest sample still there. A view is
+    only good until the writer comes round again, intact() tells whether
+    the last one still is, or whether a copy of it taken before the call
+    was whole.
+    """
+
+    def __init__(self, ring, from_start=False):
+        self.ring = ring
+        self.position = (
+            max(ring.written - ring.capacity, 0) if from_start else ring.written
+        )
+        self.overruns = 0
+        self.lost = 0
+        self._last = None
+
+    def available(self):
+        return min(self.ring.written - self.position, self.ring.capacity)
+
+    def read(self, max_samples=None):
+        """
+        Returns (counts, stamps) views of the unread samples, stopping at
+        the end of the ring, so a reader that wants everything loops until
+        it gets empty arrays.
+        """
+        ring = self.ring
+        written = ring.written
+        behind = written - self.position
+        if behind > ring.capacity:
+            self.overruns += 1
+            self.lost += behind - ring.capacity
+            self.position = written - ring.capacity
+        start = self.position % ring.capacity
+        count = min(written - self.position, ring.capacity - start)
+        if max_samples is not None:
+            count = min(count, max_samples)
+        self._last = self.position
+        self.position += count
+        return ring.counts[start : start + count], ring.stamps[start : start + count]
+
+    def intact(self):
+        # against claimed, a block still being copied in may be overwriting
+        # the oldest slots already
+        return (
+            self._last is None or self.ring.claimed - self._last <= self.ring.capacity
+        )
+
+
+class RingBackend(ADCBackend):
+    """
+    Reads a published ring as if it were the ADC, so the scope and other
+    consumers can share one acquisition process instead of each opening the
+    SPI bus. Only the pin being published can be read. The ring runs at the
+    publisher's rate; a lower requested rate is met by keeping every n-th
+    sample.
+    """
+
+    def __init__(self, name=DEFAULT_NAME, poll=0.001):
+        self.ring = SampleRing.attach(name)
+        super().__init__(self.ring.vref)
+        self.cursor = RingCursor(self.ring)
+        self.poll = poll
+
+    def close(self):
+        self.cursor = None
+        self.ring.close()
+
+    def _convert(self, channels, num_sweeps, rate, stamps, out):
+        if list(channels) != [(self.ring.pin, False)]:
+            raise ValueError(f"the ring only carries pin {self.ring.pin}")
+        ring_rate = self.ring.sample_rate
+        step = max(int(round(ring_rate / rate)), 1) if rate and ring_rate else 1
+        needed = num_sweeps * step
+
+        counts = np.empty(needed, dtype=np.uint16)
+        times = np.empty(needed, dtype=np.int64)
+        start = time.perf_counter_ns()
+        filled = 0
+        while filled < needed:
+            overruns = self.cursor.overruns
+            block_counts, block_stamps = self.cursor.read(needed - filled)
+            n = len(block_counts)
+            if n == 0:
+                time.sleep(self.poll)
+                continue
+            counts[filled : filled + n] = block_counts
+            times[filled : filled + n] = block_stamps
+            if self.cursor.overruns != overruns or not self.cursor.intact():
+                # lapped by the writer, the window would have a hole in it
+                filled = 0
+                continue
+            filled += n
+
+        out[:] = counts[::step]
+        stamps[:] = times[::step]
+        return time.perf_counter_ns() - start
+
+
+def publish(reader, ring, block=256, rate=None):
+    """
+    The acquisition loop: reads blocks from the ADC into the ring until
+    interrupted.
+    """
+    counts = np.empty(block, dtype=np.uint16)
+    stamps = np.empty(block, dtype=np.int64)
+    while True:
+        reader.read_counts(block, ring.pin, False, rate, out=counts, stamps=stamps)
+        ring.write(counts, stamps, reader.sample_rate)
+
+
+def main(reader=None, pin=0, rate=10000, seconds=5):
+    if reader is None:
+        reader = open_mcp3008("D5")
+    # keep a few seconds of history so slow readers can catch up
+    ring = SampleRing.create(int(rate * seconds), pin=pin, vref=reader.vref)
+    print(f"Publishing pin {pin} at {rate} Hz to shared memory '{ring.name}'")
+    try:
+        publish(reader, ring, rate=rate)
+    except KeyboardInterrupt:
+        print("\nExiting program.")
+    finally:
+        ring.close()
+        reader.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        # off the Pi: a recording or a generated wave, e.g. "sine 10"
+        from adc_sim import simulated_from_args
+
+        main(simulated_from_args(sys.argv[1:]))
+    else:
+        main()
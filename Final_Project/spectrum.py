@@ -0,0 +1,184 @@
+from functools import lru_cache
+import numpy as np
+
+WINDOWS = {
+    "boxcar": np.ones,
+    "hann": np.hanning,
+    "hamming": np.hamming,
+    "blackman": np.blackman,
+}
+PEAK_METHODS = ("bin", "parabolic", "quinn", "jacobsen")
+# Jacobsen's estimator is derived for the plain DFT, a tapering window
+# shrinks its offsets by about these factors (Candan's correction, fitted
+# on these numpy windows)
+JACOBSEN_GAIN = {"boxcar": 1.0, "hann": 2.01, "hamming": 1.82, "blackman": 2.51}
+
+
+class SpectrumPlan:
+    """
+    The parts of a real FFT that only depend on the window length: the
+    window function, its gain and the buffers the transform writes into.
+    Get one from plan(), which keeps the recently used ones, so the scope
+    loop builds them once instead of on every capture.
+
+    The scratch buffers are shared by everyone holding the plan, so it is
+    meant for one analysis thread at a time. What magnitude() returns is
+    the caller's own array, what transform() returns is scratch.
+    """
+
+    def __init__(self, length, window="boxcar"):
+        self.length = length
+        self.window_name = window
+        self.num_bins = length // 2 + 1
+        if window == "boxcar":
+            self.window = None
+            self.gain = float(length)
+        else:
+            self.window = WINDOWS[window](length)
+            self.window.flags.writeable = False
+            self.gain = float(np.sum(self.window))
+        self._windowed = np.empty((0, length))
+        self._spectrum = np.empty((0, self.num_bins), dtype=np.complex128)
+
+    def _scratch(self, rows):
+        if len(self._spectrum) < rows:
+            self._windowed = np.empty((rows, self.length))
+            self._spectrum = np.empty((rows, self.num_bins), dtype=np.complex128)
+        return self._windowed[:rows], self._spectrum[:rows]
+
+    def transform(self, samples):
+        """
+        Complex rfft of the windowed samples as a (windows, bins) array.
+        It lives in the plan's scratch space, so it is only good until the
+        next call on this plan.
+        """
+        samples = np.asarray(samples, dtype=np.float64)
+        rows = samples.reshape(-1, self.length)
+        windowed, spectrum = self._scratch(len(rows))
+        if self.window is None:
+            windowed = rows
+        else:
+            np.multiply(rows, self.window, out=windowed)
+        # rfft only takes out= from NumPy 2 on, the Pi's apt NumPy is 1.x
+        spectrum[...] = np.fft.rfft(windowed, axis=-1)
+        return spectrum
+
+    def magnitude(self, samples, out=None):
+        """
+        Amplitude spectrum of samples along the last axis, one window or a
+        (windows, samples) batch. Scaled by the window gain, so with the
+        default boxcar it is |rfft| / N.
+        """
+        samples = np.asarray(samples, dtype=np.float64)
+        spectrum = self.transform(samples)
+        if out is None:
+            out = np.empty(samples.shape[:-1] + (self.num_bins,))
+        magnitude = out.reshape(-1, self.num_bins)
+        np.abs(spectrum, out=magnitude)
+        magnitude /= self.gain
+        return out
+
+    def frequencies(self, sample_rate):
+        return bin_frequencies(self.length, sample_rate)
+
+
+@lru_cache(maxsize=16)
+def plan(length, window="boxcar"):
+    return SpectrumPlan(length, window)
+
+
+@lru_cache(maxsize=32)
+def bin_frequencies(length, sample_rate):
+    # read-only, every caller with the same key gets this same array
+    freqs = np.fft.rfftfreq(length, 1 / sample_rate)
+    freqs.flags.writeable = False
+    return freqs
+
+
+def peak_bin(magnitude):
+    """
+    Strongest bin above DC along the last axis.
+    """
+    return np.argmax(magnitude[..., 1:], axis=-1) + 1
+
+
+def magnitude_spectrum(samples, sample_rate, window="boxcar"):
+    """
+    One-call form, returns the bin frequencies and the amplitude spectrum.
+    """
+    samples = np.asarray(samples, dtype=np.float64)
+    spectrum_plan = plan(samples.shape[-1], window)
+    return spectrum_plan.frequencies(sample_rate), spectrum_plan.magnitude(samples)
+
+
+def _quinn_tau(x):
+    root = np.sqrt(2 / 3)
+    return 0.25 * np.log(3 * x**2 + 6 * x + 1) - np.sqrt(6) / 24 * np.log(
+        (x + 1 - root) / (x + 1 + root)
+    )
+
+
+def peak_offset(spectrum, peak, method="jacobsen", window="hann"):
+    """
+    Fraction of a bin, within +-0.5, by which the true peak of each row of
+    a complex (windows, bins) spectrum lies above its peak bin. The peak
+    bins need a neighbour on both sides.
+    """
+    rows = np.arange(len(spectrum))
+    below = spectrum[rows, peak - 1]
+    center = spectrum[rows, peak]
+    above = spectrum[rows, peak + 1]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if method == "bin":
+            offset = np.zeros(len(rows))
+        elif method == "parabolic":
+            a, b, c = np.log(np.abs([below, center, above]))
+            offset = 0.5 * (a - c) / (a - 2 * b + c)
+        elif method == "jacobsen":
+            offset = JACOBSEN_GAIN[window] * np.real(
+                (below - above) / (2 * center - below - above)
+            )
+        else:
+            plus = np.real(above / center)
+            minus = np.real(below / center)
+            delta_plus = -plus / (1 - plus)
+            delta_minus = minus / (1 - minus)
+            offset = (
+                (delta_plus + delta_minus) / 2
+                + _quinn_tau(delta_plus**2)
+                - _quinn_tau(delta_minus**2)
+            )
+    return np.where(np.isfinite(offset), np.clip(offset, -0.5, 0.5), 0.0)
+
+
+def peak_frequency(samples, sample_rate, method="jacobsen", window="hann"):
+    """
+    Frequency of the strongest spectral peak, refined to a fraction of a
+    bin from the bins either side of it. samples can be one window or a
+    (windows, samples) batch; the mean is taken out first so the DC bin
+    can not leak into the peak.
+
+    "parabolic" fits a parabola through the log magnitudes, which is close
+    to exact for the Gaussian-like main lobe of a tapering window.
+    "jacobsen" uses the complex bins and "quinn" is Quinn's second
+    estimator, which is only unbiased without a window, so it needs
+    window="boxcar". "bin" skips the refinement, the resolution is then
+    sample_rate / N.
+    """
+    if method not in PEAK_METHODS:
+        raise ValueError(f"unknown peak method {method}")
+    if method == "quinn" and window != "boxcar":
+        raise ValueError("quinn's estimator needs window='boxcar'")
+    samples = np.asarray(samples, dtype=np.float64)
+    samples = samples - samples.mean(axis=-1, keepdims=True)
+    spectrum_plan = plan(samples.shape[-1], window)
+    spectrum = spectrum_plan.transform(samples)
+
+    # the top bin is left out of the search so every peak has a neighbour
+    # on both sides
+    peak = peak_bin(np.abs(spectrum[:, : spectrum_plan.num_bins - 1]))
+    offset = peak_offset(spectrum, peak, method, window)
+
+    frequency = (peak + offset) * sample_rate / samples.shape[-1]
+    return frequency.reshape(samples.shape[:-1])
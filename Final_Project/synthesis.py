@@ -0,0 +1,193 @@
+import functools
+from fractions import Fraction
+import numpy as np
+
+SHAPES = ("sine", "square", "triangle")
+CHIRPS = ("linear", "log")
+# longest repeating block that is cached, in samples, and the most
+# periods one may span
+MAX_BLOCK = 1 << 18
+MAX_PERIODS = 64
+NOISE_BLOCK = 1 << 16
+
+
+def _shape(shape, phase, duty, out):
+    """
+    Evaluates a shape at phases in cycles, 0 <= phase < 1, into out, from
+    -1 to 1. duty is the fraction of the cycle a square wave spends high or
+    a triangle spends rising; a triangle with duty 1 is a sawtooth.
+    """
+    if shape not in SHAPES:
+        raise ValueError(f"unknown shape {shape}")
+    if shape == "sine":
+        np.multiply(phase, 2 * np.pi, out=out)
+        return np.sin(out, out=out)
+    if shape == "square":
+        out[:] = np.where(phase < duty, 1.0, -1.0)
+        return out
+    # -1 at the start of the cycle, 1 at duty, back to -1 at the end
+    rise = np.minimum(phase / max(duty, 1e-12), 1.0)
+    fall = np.clip((1 - phase) / max(1 - duty, 1e-12), 0.0, 1.0)
+    np.minimum(rise, fall, out=out)
+    out *= 2
+    out -= 1
+    return out
+
+
+@functools.lru_cache(maxsize=32)
+def repeating_block(shape, frequency, sample_rate, duty=0.5):
+    """
+    The shortest run of samples that a wave repeats exactly, a whole number
+    of periods that is also a whole number of samples, as a read-only
+    array. None when that is longer than MAX_BLOCK samples, or more than
+    MAX_PERIODS periods, and the wave has to be computed sample by sample.
+    """
+    ratio = Fraction(sample_rate / frequency).limit_denominator(MAX_PERIODS)
+    if abs(float(ratio) - sample_rate / frequency) > 1e-9 * float(ratio):
+        return None
+    length, periods = ratio.numerator, ratio.denominator
+    if length > MAX_BLOCK:
+        return None
+    # exact phases from integers, so the block joins up with itself
+    phase = (np.arange(length) * periods % length) / length
+    block = _shape(shape, phase, duty, np.empty(length))
+    block.flags.writeable = False
+    return block
+
+
+def _tile(block, start, out):
+    # copies the block into out as if it repeated forever from sample 0
+    length = len(block)
+    n = len(out)
+    offset = start % length
+    head = min(length - offset, n)
+    out[:head] = block[offset : offset + head]
+    reps = (n - head) // length
+    out[head : head + reps * length].reshape(reps, length)[:] = block
+    rest = n - head - reps * length
+    out[n - rest :] = block[:rest]
+    return out
+
+
+def waveform(
+    shape,
+    frequency,
+    sample_rate,
+    num_samples,
+    amplitude=1.0,
+    duty=0.5,
+    start=0,
+    out=None,
+):
+    """
+    num_samples of a sine, square or triangle wave from -amplitude to
+    amplitude, starting at sample start of a wave that begins its cycle at
+    sample 0. out, when given, is filled in place and returned, so the
+    same buffer serves every call. When the wave repeats within a block
+    that is cached, it is tiled from that and nothing is evaluated.
+    """
+    if out is None:
+        out = np.empty(num_samples)
+    out = out[:num_samples]
+    block = repeating_block(shape, frequency, sample_rate, duty)
+    if block is not None:
+        _tile(block, start, out)
+    else:
+        phase = np.arange(start, start + num_samples) * (frequency / sample_rate)
+        _shape(shape, phase % 1.0, duty, out)
+    if amplitude != 1.0:
+        out *= amplitude
+    return out
+
+
+def multitone(tones, sample_rate, num_samples, start=0, out=None):
+    """
+    Sum of several waves. tones holds (shape, frequency, amplitude) or
+    (shape, frequency, amplitude, duty) tuples.
+    """
+    if out is None:
+        out = np.empty(num_samples)
+    out = out[:num_samples]
+    out[:] = 0.0
+    scratch = np.empty(num_samples)
+    for tone in tones:
+        shape, frequency, amplitude = tone[:3]
+        duty = tone[3] if len(tone) > 3 else 0.5
+        out += waveform(
+            shape, frequency, sample_rate, num_samples, amplitude, duty, start, scratch
+        )
+    return out
+
+
+def chirp(
+    f0,
+    f1,
+    sample_rate,
+    num_samples,
+    shape="sine",
+    method="linear",
+    amplitude=1.0,
+    duty=0.5,
+    out=None,
+):
+    """
+    A wave sweeping from f0 to f1 Hz over num_samples, linearly or with a
+    constant ratio per second ("log"). The phase is the integral of the
+    frequency, so the cycles join up without jumps.
+    """
+    if method not in CHIRPS:
+        raise ValueError(f"unknown method {method}")
+    if out is None:
+        out = np.empty(num_samples)
+    out = out[:num_samples]
+    duration = num_samples / sample_rate
+    t = np.arange(num_samples) / sample_rate
+    if method == "linear":
+        phase = t * (f0 + (f1 - f0) * t / (2 * duration))
+    else:
+        growth = np.log(f1 / f0) / duration
+        phase = f0 * np.expm1(growth * t) / growth
+    _shape(shape, phase % 1.0, duty, out)
+    if amplitude != 1.0:
+        out *= amplitude
+    return out
+
+
+class NoiseSource:
+    """
+    Gaussian noise added in place, drawn block by block into one buffer
+    that is kept between calls, so long signals do not need a second array
+    of their size for the noise.
+    """
+
+    def __init__(self, seed=None, block_size=NOISE_BLOCK):
+        self.rng = np.random.default_rng(seed)
+        self._buffer = np.empty(block_size)
+
+    def add(self, signal, level):
+        if level == 0:
+            return signal
+        size = len(self._buffer)
+        # runs of the signal's own memory, a reshape of a strided or
+        # transposed view would be a copy and the noise would go nowhere
+        with np.nditer(
+            signal,
+            flags=["external_loop", "zerosize_ok"],
+            op_flags=["readwrite"],
+            order="K",
+        ) as runs:
+            for run in runs:
+                for i in range(0, len(run), size):
+                    chunk = run[i : i + size]
+                    noise = self._buffer[: len(chunk)]
+                    self.rng.standard_normal(out=noise)
+                    noise *= level
+                    chunk += noise
+        return signal
+
+
+def add_noise(signal, level, source=None):
+    """
+    Adds Gaussian noise of standard deviation level to signal in place.
+    """
+    return (source or NoiseSource()).add(signal, level)
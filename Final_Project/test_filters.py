@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+from filters import moving_average
+
+
+def test_valid_matches_convolve():
+    x = np.random.default_rng(0).normal(size=200)
+    for window_size in (1, 5, 200):
+        expected = np.convolve(x, np.ones(window_size) / window_size, "valid")
+        assert np.allclose(moving_average(x, window_size), expected)
+
+
+def test_valid_window_longer_than_samples_is_empty():
+    assert moving_average([1.0, 2.0, 3.0], 5).shape == (0,)
+    assert moving_average(np.ones((2, 3)), 4).shape == (2, 0)
+
+
+def test_same_window_longer_than_samples_is_clipped():
+    x = np.array([1.0, 2.0, 3.0, 6.0])
+    out = moving_average(x, 7, "same")
+    # every window covers the whole input, or all of it but the last sample
+    assert np.allclose(out, [3.0, 3.0, 3.0, 3.0])
+    assert np.allclose(moving_average(x, 6, "same"), [2.0, 3.0, 3.0, 3.0])
+    assert moving_average(np.ones((2, 3)), 10, "same").shape == (2, 3)
+
+
+def test_bad_window_size():
+    with pytest.raises(ValueError):
+        moving_average([1.0, 2.0], 0)
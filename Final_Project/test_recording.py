@@ -0,0 +1,47 @@
+import os
+import subprocess
+import sys
+import numpy as np
+from archive import ArchiveWriter
+from recording import RecordingWriter
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# every way of reading a capture, in a fresh interpreter that turns an
+# unclosed file into an error
+READERS = """
+import sys
+from archive import read_source
+from recording import export_csv, load_capture
+for path in sys.argv[1:]:
+    load_capture(path)
+    load_capture(path, 0.001, 0.002)
+    export_csv(path, path + ".csv")
+    read_source(path)
+"""
+
+
+def write_captures(folder):
+    counts = (np.arange(5000) % 1024).astype(np.uint16)
+    stamps = np.arange(5000, dtype=np.int64) * 100000
+    paths = []
+    for name, writer in (("m.rec", RecordingWriter), ("m_zlib.sca", ArchiveWriter)):
+        path = os.path.join(folder, name)
+        with writer(path, 10000, chunk_size=1024) as w:
+            w.write(counts, stamps + w.start_ns)
+        paths.append(path)
+    return paths
+
+
+def test_readers_close_their_files(tmp_path):
+    paths = write_captures(str(tmp_path))
+    result = subprocess.run(
+        [sys.executable, "-X", "dev", "-W", "error::ResourceWarning"]
+        + ["-c", READERS]
+        + paths,
+        cwd=HERE,
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    assert "ResourceWarning" not in result.stderr, result.stderr
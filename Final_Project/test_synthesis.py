@@ -0,0 +1,17 @@
+import numpy as np
+from synthesis import NoiseSource
+
+
+def test_noise_reaches_strided_views():
+    base = np.zeros(20000)
+    NoiseSource(0).add(base[::2], 0.1)
+    assert 0.09 < base[::2].std() < 0.11
+    # the samples in between are not part of the view
+    assert not base[1::2].any()
+
+
+def test_noise_reaches_transposed_views():
+    base = np.zeros((5000, 4))
+    signal = base.T
+    assert NoiseSource(0).add(signal, 0.1) is signal
+    assert 0.09 < base.std() < 0.11
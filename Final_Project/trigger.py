@@ -0,0 +1,276 @@
+import time
+import numpy as np
+from acquisition import (
+    MAX_STEP,
+    VOLTS_PER_COUNT,
+    counts_to_volts,
+    find_gaps,
+    sample_rate_from_stamps,
+)
+
+MODES = ("auto", "normal", "single")
+
+
+class EdgeTrigger:
+    """
+    Level trigger with hysteresis on a rising or falling edge.
+
+    For a rising edge the trigger arms once the signal drops below
+    level - hysteresis and fires when it reaches level again, so noise
+    riding on a slow edge can not fire it twice. Falling edges mirror that.
+    The arm/fire state carries across blocks.
+    """
+
+    def __init__(self, level, slope="rising", hysteresis=0.05):
+        if slope not in ("rising", "falling"):
+            raise ValueError(f"unknown trigger slope {slope}")
+        self.level = level
+        self.slope = slope
+        self.hysteresis = hysteresis
+        # -1 armed, 1 fired, 0 not known yet
+        self.state = 0
+
+    def reset(self):
+        self.state = 0
+
+    def _states(self, samples, scale):
+        level = self.level / scale
+        hysteresis = self.hysteresis / scale
+        if self.slope == "rising":
+            armed = samples < level - hysteresis
+            fired = samples >= level
+        else:
+            armed = samples > level + hysteresis
+            fired = samples <= level
+        events = fired.astype(np.int8) - armed.astype(np.int8)
+
+        # carry the last arm/fire event forward to get the state per sample
+        positions = np.where(events != 0, np.arange(len(events)), -1)
+        last = np.maximum.accumulate(positions)
+        state = np.where(last >= 0, events[last], self.state)
+        previous = np.concatenate(([self.state], state[:-1]))
+        return state, np.flatnonzero((state == 1) & (previous == -1))
+
+    def find(self, samples, first=0, scale=1.0):
+        """
+        Returns the index of the first edge in samples at or after first,
+        or None. scale is the size of one sample unit in volts, e.g. one
+        ADC code. The state is left where the scan stopped.
+        """
+        if len(samples) == 0:
+            return None
+        state, edges = self._states(samples, scale)
+        edges = edges[edges >= first]
+        if len(edges):
+            self.state = state[edges[0]]
+            return edges[0]
+        self.state = state[-1]
+        return None
+
+    def find_all(self, samples, scale=1.0):
+        """
+        Returns the indices of every edge in samples and leaves the state at
+        the end of the block.
+        """
+        if len(samples) == 0:
+            return np.empty(0, dtype=np.intp)
+        state, edges = self._states(samples, scale)
+        self.state = state[-1]
+        return edges
+
+
+class TriggeredReader:
+    """
+    Wraps an ADC backend so every window read starts on a trigger edge.
+
+    Samples are read into a history buffer, a window and its pre-trigger
+    part in one go and small blocks after that. Once an edge is found with
+    enough history before it, reading continues until the rest of the
+    window is in, so windows come out phase aligned with the edge at
+    pre_trigger of the way in. The history only ever holds consecutive
+    samples: a block that does not follow on from it, after a pause between
+    calls or a stalled thread, replaces it, so no triggered window spans a
+    hole. In auto mode a free-running window is returned when nothing
+    triggers within timeout seconds, the newest samples without a hole or
+    else one read as it came, normal mode returns None instead, and single
+    mode returns one triggered window and then None until arm() is called
+    again. Every call reads at least one block before it gives up. It has
+    the read_counts interface of a backend, so it can be handed to
+    BackgroundCapture in place of the reader; re-arm it through
+    BackgroundCapture.arm() then, and stop() cancels a read in progress.
+    """
+
+    def __init__(
+        self, reader, trigger, pre_trigger=0.25, mode="auto", timeout=0.5, block=64
+    ):
+        if mode not in MODES:
+            raise ValueError(f"unknown trigger mode {mode}")
+        self.reader = reader
+        self.trigger = trigger
+        self.pre_trigger = pre_trigger
+        self.mode = mode
+        self.timeout = timeout
+        self.block = block
+        self.vref = reader.vref
+        self.sample_rate = None
+        self.timestamps = None
+        # whether the last window started on an edge
+        self.triggered = False
+        self._armed = True
+        self._cancelled = False
+        self._config = None
+        self._length = 0  # valid samples in the history
+        self._search = 0  # next history index to look for an edge at
+
+    def arm(self):
+        self._armed = True
+
+    @property
+    def spent(self):
+        """
+        Whether single mode has fired and waits for arm().
+        """
+        return not self._armed
+
+    def cancel(self):
+        """
+        Makes the read_counts call in progress, or else the next one,
+        return None after its current read, so a capture thread waiting on
+        it can be stopped.
+        """
+        self._cancelled = True
+
+    def close(self):
+        self.reader.close()
+
+    def _reset(self, config, num_samples):
+        self._config = config
+        capacity = num_samples + int(num_samples * self.pre_trigger) + self.block
+        self._counts = np.empty(capacity, dtype=np.uint16)
+        self._stamps = np.empty(capacity, dtype=np.int64)
+        self._length = 0
+        self._search = 0
+        self.trigger.reset()
+
+    def _append(self, pin, differential, rate, count, cut=True):
+        # drop the oldest samples when the next read does not fit
+        overflow = self._length + count - len(self._counts)
+        if overflow > 0:
+            keep = self._length - overflow
+            self._counts[:keep] = self._counts[overflow : self._length]
+            self._stamps[:keep] = self._stamps[overflow : self._length]
+            self._length = keep
+            self._search = max(self._search - overflow, 0)
+        end = self._length + count
+        self.reader.read_counts(
+            count,
+            pin,
+            differential,
+            rate,
+            out=self._counts[self._length : end],
+            stamps=self._stamps[self._length : end],
+        )
+        dropped = max(overflow, 0)
+        # a window can not span a hole, before the read or inside it, so
+        # everything up to the last one goes
+        first = max(self._length - 1, 0)
+        gaps = find_gaps(self._stamps[first:end], MAX_STEP, rate) if cut else []
+        if len(gaps):
+            start = first + gaps[-1]
+            self._counts[: end - start] = self._counts[start:end]
+            self._stamps[: end - start] = self._stamps[start:end]
+            dropped += start
+            end -= start
+            self._search = 0
+            self.trigger.reset()
+        self._length = end
+        return dropped, len(gaps) > 0
+
+    def read_counts(
+        self, num_samples, pin=0, differential=False, rate=None, out=None, stamps=None
+    ):
+        """
+        Reads one window of num_samples codes. Returns out, or None when
+        normal or single mode gave up, single mode is already spent or the
+        read was cancelled.
+        """
+        if not self._armed:
+            return None
+        config = (num_samples, pin, differential, rate)
+        if config != self._config:
+            self._reset(config, num_samples)
+        pre = int(num_samples * self.pre_trigger)
+        # the history holds ADC codes, compare against the level in codes
+        scale = VOLTS_PER_COUNT * self.vref
+
+        edge = None
+        deadline = time.perf_counter() + self.timeout
+        # the history is topped up to a window plus room for the edge in one
+        # read, and read again whole after a hole, so most windows come out
+        # of a single read: every extra read is another chance of a hole.
+        # Every call reads at least a block, with a short timeout giving up
+        # again right away would turn the caller into a busy loop.
+        wanted = num_samples + pre
+        count = max(self.block, wanted - self._length)
+        while True:
+            if self._cancelled:
+                self._cancelled = False
+                return None
+            dropped, hole = self._append(pin, differential, rate, count)
+            if edge is not None:
+                edge -= dropped
+                if edge < 0:
+                    # its history went with a hole, look again
+                    edge = None
+            if edge is None:
+                found = self.trigger.find(
+                    self._counts[self._search : self._length],
+                    max(pre - self._search, 0),
+                    scale,
+                )
+                if found is not None:
+                    edge = self._search + found
+                self._search = self._length
+            if edge is not None:
+                missing = num_samples - pre - (self._length - edge)
+                if missing <= 0:
+                    start = edge - pre
+                    self.triggered = True
+                    break
+                # the rest of the window in one read
+                count = missing
+                continue
+            if time.perf_counter() > deadline:
+                if self.mode != "auto":
+                    return None
+                if self._length < num_samples:
+                    # no window without a hole in time, show one read as it
+                    # came, its stamps tell where the hole is
+                    self._append(pin, differential, rate, num_samples, cut=False)
+                # nothing to trigger on, show the latest samples
+                start = self._length - num_samples
+                self.triggered = False
+                break
+            count = wanted if hole else max(self.block, wanted - self._length)
+
+        end = start + num_samples
+        if out is None:
+            out = np.empty(num_samples, dtype=np.uint16)
+        if stamps is None:
+            stamps = np.empty(num_samples, dtype=np.int64)
+        out[:] = self._counts[start:end]
+        stamps[:] = self._stamps[start:end]
+        self.timestamps = stamps
+        self.sample_rate = sample_rate_from_stamps(stamps)
+        # the next window starts looking after this one, freshly armed
+        self._search = max(self._search, end)
+        self.trigger.reset()
+        if self.mode == "single" and self.triggered:
+            self._armed = False
+        return out
+
+    def read_voltage(self, num_samples, pin=0, differential=False, rate=None):
+        counts = self.read_counts(num_samples, pin, differential, rate)
+        if counts is None:
+            return None
+        return counts_to_volts(counts, self.vref)
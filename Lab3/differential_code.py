@@ -1,8 +1,15 @@
+import os
+import sys
 import busio
 import digitalio
 import board
 import adafruit_mcp3xxx.mcp3008 as MCP
-from adafruit_mcp3xxx.analog_in import AnalogIn
+
+# the block reader is shared with the final project
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Final_Project")
+)
+from acquisition import MCP3008Reader, counts_to_volts
 
 # create the spi bus
 spi = busio.SPI(clock=board.SCK, MISO=board.MISO, MOSI=board.MOSI)
@@ -10,11 +17,17 @@ spi = busio.SPI(clock=board.SCK, MISO=board.MISO, MOSI=board.MOSI)
 # create the cs (chip select)
 cs = digitalio.DigitalInOut(board.D5)
 
-# create the mcp object
-mcp = MCP.MCP3008(spi, cs)
+# create the block reader
+reader = MCP3008Reader(spi, cs)
 
-# create a differential ADC channel between Pin 0 and Pin 1
-chan = AnalogIn(mcp, MCP.P0, MCP.P1)
+# sweep the differential pair between Pin 0 and Pin 1 together with both of
+# its single-ended inputs, one row per channel
+channels = [(MCP.P0, MCP.P1), MCP.P0, MCP.P1]
+counts = reader.read_scan(channels, 100)
+voltages = counts_to_volts(counts, reader.vref)
 
-print("Differential ADC Value: ", chan.value)
-print("Differential ADC Voltage: " + str(chan.voltage) + "V")
+print("Differential ADC Value: ", counts[0].mean())
+print("Differential ADC Voltage: " + str(voltages[0].mean()) + "V")
+print("Pin 0 Voltage: " + str(voltages[1].mean()) + "V")
+print("Pin 1 Voltage: " + str(voltages[2].mean()) + "V")
+print(f"Scan rate: {reader.sample_rate:.2f} sweeps/s")
@@ -3,10 +3,17 @@ import digitalio
 import board
 import adafruit_mcp3xxx.mcp3008 as MCP
 from adafruit_mcp3xxx.analog_in import AnalogIn
+import os
+import sys
 import time
 import RPi.GPIO as GPIO
 import numpy as np
-from scipy import stats
+
+# the classifier is shared with the final project
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Final_Project")
+)
+from classifier import classify
 
 # Create the SPI bus
 spi = busio.SPI(clock=board.SCK, MISO=board.MISO, MOSI=board.MOSI)
@@ -24,51 +31,10 @@ def calculate_frequency(samples, sample_rate):
     return frequency
 
 
-def moving_average_filter(samples, window_size=5):
-    return np.convolve(samples, np.ones(window_size) / window_size, mode="valid")
-
-
 def detect_waveform_shape(samples, sample_rate):
     # set at slightly above floating voltage
-    print("The max voltage is", np.max(samples))
-    if np.max(samples) < 1.1:
-        print("returning no voltage")
-        return "No Voltage"
-
-    # run a convolution on the raw samples
-    filtered_samples = moving_average_filter(samples)
-    # normalize samples to be between certain ranges
-    normalized_samples = (filtered_samples - np.mean(filtered_samples)) / np.std(
-        filtered_samples
-    )
-
-    # run some very cool fft magic
-    fft_result = np.fft.fft(normalized_samples)
-    positive_fft_result = np.abs(fft_result[: len(fft_result) // 2]) / len(
-        normalized_samples
-    )
-
-    # find the index at which the fundamental freq is
-    fundamental_freq_index = np.argmax(positive_fft_result[1:]) + 1
-
-    # more magic math
-    crest_factor = np.max(np.abs(normalized_samples)) / np.sqrt(
-        np.mean(normalized_samples**2)
-    )
-    # more magic statistics to measure data dispersion
-    kurtosis = stats.kurtosis(normalized_samples)
-    print(f"Crest Factor: {crest_factor}")
-    print(f"Kurtosis: {kurtosis}")
-    if (
-        np.max(positive_fft_result[fundamental_freq_index::2])
-        > 0.1 * positive_fft_result[fundamental_freq_index]
-        and crest_factor < 1.2
-    ):
-        return "Square Wave"
-    elif crest_factor > 1.3 and crest_factor < 1.5 and kurtosis < -1:
-        return "Sine Wave"
-    else:
-        return "Triangle Wave"
+    shape, _ = classify(samples, sample_rate, min_voltage=1.1)
+    return shape
 
 
 def main():
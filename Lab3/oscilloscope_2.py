@@ -1,4 +1,5 @@
 import os
+import sys
 import time
 import busio
 import digitalio
@@ -6,7 +7,12 @@ import board
 import adafruit_mcp3xxx.mcp3008 as MCP
 from adafruit_mcp3xxx.analog_in import AnalogIn
 import numpy as np
-from scipy.signal import find_peaks
+
+# the filters are shared with the final project
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Final_Project")
+)
+from filters import moving_average
 
 # spi, adc setup
 spi = busio.SPI(clock=board.SCK, MISO=board.MISO, MOSI=board.MOSI)
@@ -21,7 +27,7 @@ samples = 1000  # Increased number of samples for better detection
 
 # Denoising using a moving average
 def denoise_signal(signal, window_size=50):
-    return np.convolve(signal, np.ones(window_size) / window_size, mode="same")
+    return moving_average(signal, window_size, mode="same")
 
 
 def sample_waveform():
@@ -36,7 +42,10 @@ def calculate_frequency(data):
     # Apply denoising
     denoised_data = denoise_signal(data)
 
-    # Peak detection with prominence to avoid small fluctuations
+    # Peak detection with prominence to avoid small fluctuations, scipy is
+    # only loaded the first time it is needed
+    from scipy.signal import find_peaks
+
     peaks, properties = find_peaks(denoised_data, prominence=0.05)
     if len(peaks) >= 2:
         periods = np.diff(peaks) / sampling_rate
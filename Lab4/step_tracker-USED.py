@@ -1,8 +1,16 @@
+import os
+import sys
 import board
 import busio
 import adafruit_mpu6050
 from time import sleep, perf_counter
 
+# the filters are shared with the final project
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Final_Project")
+)
+from filters import RecursiveFilter
+
 i2c = busio.I2C(board.SCL, board.SDA)
 mpu = adafruit_mpu6050.MPU6050(i2c)
 
@@ -11,6 +19,8 @@ threshold = 10  # threshold for step detection
 last_z_accel = 0
 step_interval = 0.3  # minimum time between to avoid false detection
 last_step_time = 0
+# readings come every 0.1 s, smooth out spikes much shorter than a step
+smoother = RecursiveFilter.single_pole(cutoff=3, sample_rate=10)
 
 print("Starting step tracking...")
 
@@ -21,6 +31,9 @@ while True:
     # get time
     current_time = perf_counter()
 
+    # the filter state carries from one reading to the next
+    accel_z = smoother.step(accel_z)
+
     # check when acceleration passes a threshold
     if abs(accel_z) > threshold and (current_time - last_step_time) > step_interval:
         step_count += 1